@@ -28,6 +28,7 @@
         'fill_percentage': float,         # Процент наполнения (%)
         'num_objects': int,               # Количество обнаруженных объектов
         'objects_info': List[dict],       # Детальная информация об объектах
+        'shelves_fill': List[float],      # Процент наполнения каждой полки (%)
         'image_size': Tuple[int, int]    # Размер изображения (width, height)
     }
 
@@ -57,6 +58,8 @@
 """
 
 import os
+import threading
+import time
 from typing import List, Tuple, Union, Optional
 import numpy as np
 
@@ -66,18 +69,24 @@ from ultralytics import YOLO
 from MVP.area_calculation.calculations import is_rectangle_inside_shelves, calculate_union_area_sweepline, \
     load_shelf_coordinates_from_json, visualize_shelves_and_predictions
 from MVP.config import CONFIDENCE_THRESHOLD
+from MVP.governor.governor import FrameGovernor
+from MVP.metrics.metrics import get_metrics
+from MVP.quality.quality_gate import FrameQualityGate
 
 
 class AreaCalculator:
     def __init__(self, model: YOLO):
         self.model = model
         self.confidence_threshold = CONFIDENCE_THRESHOLD
+        # Одна модель обслуживает все камеры процесса, а предиктор YOLO не потокобезопасен
+        self._model_lock = threading.Lock()
 
     def calculate_shelf_fill_percentage(
             self,
             image: Union[str, np.ndarray],
             shelf_coordinates: List[Tuple[float, float, float, float]] = None,
-            filter_objects_in_shelves: bool = False
+            filter_objects_in_shelves: bool = False,
+            camera_name: str = None
     ) -> dict:
         """
         Вычисляет площадь объектов на изображении и процент наполнения полок.
@@ -87,6 +96,7 @@ class AreaCalculator:
             shelf_coordinates: Список координат полок в формате [(x1, y1, x2, y2), ...]
                               Если None, используется вся площадь изображения
             filter_objects_in_shelves: Если True, учитываются только объекты, находящиеся внутри полок
+            camera_name: Имя камеры для метрик времени этапов (обычно IP)
 
         Returns:
             Словарь с результатами:
@@ -95,12 +105,16 @@ class AreaCalculator:
                 'shelf_total_area': общая площадь полок,
                 'fill_percentage': процент наполнения,
                 'num_objects': количество обнаруженных объектов,
-                'objects_info': список информации об объектах
+                'objects_info': список информации об объектах,
+                'shelves_fill': процент наполнения каждой полки (в порядке shelf_coordinates)
             }
         """
         # Делаем предсказание (YOLO работает как с путями, так и с numpy arrays)
-        results = self.model(image, conf=self.confidence_threshold)
+        metrics = get_metrics()
+        with self._model_lock, metrics.timer('inference', camera_name):
+            results = self.model(image, conf=self.confidence_threshold)
         result = results[0]
+        postprocess_start = time.perf_counter()
 
         # Получаем размеры изображения
         if isinstance(image, str):
@@ -149,18 +163,32 @@ class AreaCalculator:
         # Вычисляем общую площадь полок
         shelf_total_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in shelf_coordinates)
 
+        # Процент наполнения каждой полки: объекты обрезаются по границам полки
+        shelves_fill = []
+        for sx1, sy1, sx2, sy2 in shelf_coordinates:
+            shelf_area = (sx2 - sx1) * (sy2 - sy1)
+            clipped = [
+                (max(x1, sx1), max(y1, sy1), min(x2, sx2), min(y2, sy2))
+                for x1, y1, x2, y2 in objects_rectangles
+                if x1 < sx2 and x2 > sx1 and y1 < sy2 and y2 > sy1
+            ]
+            shelf_fill = calculate_union_area_sweepline(clipped) / shelf_area * 100 if shelf_area > 0 else 0.0
+            shelves_fill.append(shelf_fill)
+
         # Вычисляем процент наполнения
         if shelf_total_area > 0:
             fill_percentage = (total_objects_area / shelf_total_area) * 100
         else:
             fill_percentage = 0.0
 
+        metrics.observe('postprocess', camera_name, time.perf_counter() - postprocess_start)
         return {
             'total_objects_area': total_objects_area,
             'shelf_total_area': shelf_total_area,
             'fill_percentage': fill_percentage,
             'num_objects': len(objects_rectangles),
             'objects_info': objects_info,
+            'shelves_fill': shelves_fill,
             'image_size': (img_width, img_height)
         }
 
@@ -170,7 +198,9 @@ class AreaCalculator:
             shelf_coordinates: List[Tuple[float, float, float, float]] = None,
             filter_objects_in_shelves: bool = False,
             callback: Optional[callable] = None,
-            skip_frames: int = 0
+            skip_frames: int = 0,
+            governor: Optional[FrameGovernor] = None,
+            quality_gate: Optional[FrameQualityGate] = None
     ):
         """
         Обрабатывает поток кадров с камеры и вычисляет процент наполнения полок.
@@ -182,6 +212,11 @@ class AreaCalculator:
             callback: Функция обратного вызова, которая будет вызвана с результатами для каждого кадра.
                      Принимает (frame, results_dict)
             skip_frames: Количество кадров для пропуска между обработками (для оптимизации производительности)
+            governor: Адаптивный регулятор шага обработки (FrameGovernor).
+                      Если задан, skip_frames игнорируется и шаг подбирается по времени
+                      декодирования и инференса
+            quality_gate: Проверка качества кадра (FrameQualityGate). Отбракованные кадры
+                          (смаз, темнота, перекрытие полки) не передаются в модель
 
         Yields:
             Tuple (frame, results_dict) для каждого обработанного кадра
@@ -189,22 +224,37 @@ class AreaCalculator:
         frame_count = 0
 
         while True:
+            decode_start = time.perf_counter()
             frame = camera.read_frame()
 
             if frame is None:
                 continue
 
+            if governor is not None:
+                governor.record_decode(time.perf_counter() - decode_start)
+                if not governor.should_process():
+                    frame_count += 1
+                    continue
             # Пропускаем кадры для оптимизации
-            if skip_frames > 0 and frame_count % (skip_frames + 1) != 0:
+            elif skip_frames > 0 and frame_count % (skip_frames + 1) != 0:
+                frame_count += 1
+                continue
+
+            # Отбраковываем плохие кадры до запуска модели
+            if quality_gate is not None and quality_gate.check(frame, shelf_coordinates) is not None:
                 frame_count += 1
                 continue
 
             # Обрабатываем кадр
+            inference_start = time.perf_counter()
             results = self.calculate_shelf_fill_percentage(
                 image=frame,
                 shelf_coordinates=shelf_coordinates,
-                filter_objects_in_shelves=filter_objects_in_shelves
+                filter_objects_in_shelves=filter_objects_in_shelves,
+                camera_name=camera.ip_camera
             )
+            if governor is not None:
+                governor.record_inference(time.perf_counter() - inference_start)
 
             # Вызываем callback, если он задан
             if callback:
@@ -215,7 +265,8 @@ class AreaCalculator:
     def frame_camera(self,
             camera,
             shelf_coordinates: List[Tuple[float, float, float, float]] = None,
-            filter_objects_in_shelves: bool = False
+            filter_objects_in_shelves: bool = False,
+            quality_gate: Optional[FrameQualityGate] = None
                      ):
         """
                Обрабатывает поток кадров с камеры и вычисляет процент наполнения полок.
@@ -224,6 +275,7 @@ class AreaCalculator:
                    camera: Экземпляр класса Camera
                    shelf_coordinates: Список координат полок в формате [(x1, y1, x2, y2), ...]
                    filter_objects_in_shelves: Если True, учитываются только объекты, находящиеся внутри полок
+                   quality_gate: Проверка качества кадра. Если кадр отбракован, results равен None
 
                Yields:
                    Tuple (frame, results_dict) для каждого обработанного кадра
@@ -232,6 +284,11 @@ class AreaCalculator:
 
         frame = camera.read_frame()
 
+        if frame is None:
+            return None, None
+
+        if quality_gate is not None and quality_gate.check(frame, shelf_coordinates) is not None:
+            return frame, None
 
 
 
@@ -240,7 +297,8 @@ class AreaCalculator:
         results = self.calculate_shelf_fill_percentage(
                 image=frame,
                 shelf_coordinates=shelf_coordinates,
-                filter_objects_in_shelves=filter_objects_in_shelves
+                filter_objects_in_shelves=filter_objects_in_shelves,
+                camera_name=camera.ip_camera
             )
 
         # Вызываем callback, если он задан
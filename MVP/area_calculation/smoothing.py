@@ -0,0 +1,133 @@
+"""
+Модуль временного сглаживания процента наполнения полок.
+
+Одно измерение calculate_shelf_fill_percentage на одном кадре шумное:
+проходящий покупатель или объект с низкой уверенностью раскачивают значение,
+и каждое такое колебание превращается в отправку и запись в БД. Этот модуль
+сглаживает значения потоково, отдельно для каждой камеры и каждой полки,
+за O(1) на измерение (медиана - за O(window) при небольшом фиксированном окне).
+
+Фильтры:
+    - EmaFilter: экспоненциальное скользящее среднее (SMOOTHING_ALPHA)
+    - MedianFilter: скользящая медиана по последним SMOOTHING_WINDOW измерениям
+    - HysteresisFilter: выход меняется, только если вход отклонился больше
+      чем на SMOOTHING_HYSTERESIS процентных пунктов
+
+Классы:
+    FillSmoother: Набор фильтров по ключу (камера, полка)
+
+Методы FillSmoother:
+    - update(key, results): Возвращает results со сглаженными fill_percentage и shelves_fill
+                            (исходные значения сохраняются в raw_fill_percentage и raw_shelves_fill)
+    - reset(key): Сбрасывает состояние камеры (например, после ночной паузы)
+
+    Один FillSmoother используется потоками всех камер процесса, методы защищены блокировкой.
+
+Использование:
+    from MVP.area_calculation.smoothing import FillSmoother
+
+    smoother = FillSmoother(method='ema')
+    results = smoother.update(camera.ip_camera, results)
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import bisect
+import threading
+from collections import deque
+
+from MVP.config import SMOOTHING_METHOD, SMOOTHING_ALPHA, SMOOTHING_WINDOW, SMOOTHING_HYSTERESIS
+
+
+class EmaFilter:
+    def __init__(self, alpha: float = SMOOTHING_ALPHA):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class MedianFilter:
+    def __init__(self, window: int = SMOOTHING_WINDOW):
+        self.window = window
+        self._values = deque()
+        self._sorted = []
+
+    def update(self, value: float) -> float:
+        self._values.append(value)
+        bisect.insort(self._sorted, value)
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        count = len(self._sorted)
+        middle = count // 2
+        if count % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+
+class HysteresisFilter:
+    def __init__(self, band: float = SMOOTHING_HYSTERESIS):
+        self.band = band
+        self.value = None
+
+    def update(self, value: float) -> float:
+        if self.value is None or abs(value - self.value) > self.band:
+            self.value = value
+        return self.value
+
+
+FILTERS = {
+    'ema': EmaFilter,
+    'median': MedianFilter,
+    'hysteresis': HysteresisFilter,
+}
+
+
+class FillSmoother:
+    def __init__(self, method: str = SMOOTHING_METHOD):
+        """
+        Args:
+            method: 'ema', 'median', 'hysteresis' или None (без сглаживания)
+        """
+        if method is not None and method not in FILTERS:
+            raise ValueError(f"Неизвестный метод сглаживания: {method}")
+        self.method = method
+        self._lock = threading.Lock()
+        # (ключ камеры, индекс полки или None для всей камеры) -> фильтр
+        self._filters = {}
+
+    def _filter(self, key, shelf_index):
+        """Фильтр (камера, полка). Вызывается под self._lock"""
+        filter_key = (key, shelf_index)
+        if filter_key not in self._filters:
+            self._filters[filter_key] = FILTERS[self.method]()
+        return self._filters[filter_key]
+
+    def update(self, key, results: dict) -> dict:
+        """Возвращает копию results со сглаженными значениями наполнения"""
+        if self.method is None or results is None:
+            return results
+
+        shelves_fill = results.get('shelves_fill', [])
+        smoothed = dict(results)
+        smoothed['raw_fill_percentage'] = results['fill_percentage']
+        smoothed['raw_shelves_fill'] = shelves_fill
+        with self._lock:
+            smoothed['fill_percentage'] = self._filter(key, None).update(results['fill_percentage'])
+            smoothed['shelves_fill'] = [
+                self._filter(key, index).update(value) for index, value in enumerate(shelves_fill)
+            ]
+        return smoothed
+
+    def reset(self, key):
+        """Сбрасывает фильтры камеры"""
+        with self._lock:
+            for filter_key in [filter_key for filter_key in self._filters if filter_key[0] == key]:
+                del self._filters[filter_key]
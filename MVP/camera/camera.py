@@ -63,6 +63,8 @@ import time
 import cv2
 from dotenv import load_dotenv
 
+from MVP.metrics.metrics import get_metrics
+
 load_dotenv()
 
 
@@ -106,7 +108,8 @@ class Camera:
             self._connect()
             return None
 
-        ret, frame = self.cap.read()
+        with get_metrics().timer('decode', self.ip_camera):
+            ret, frame = self.cap.read()
 
         if not ret:
             print("Потеря кадров. Попытка переподключения...")
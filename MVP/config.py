@@ -16,6 +16,12 @@
                 Используется для оптимизации производительности
                 0 = обрабатывать каждый кадр
                 7 = обрабатывать каждый 8-й кадр
+    ADAPTIVE_SKIP_FRAMES: Включает адаптивный регулятор шага обработки (MVP/governor)
+                         SKIP_FRAMES используется как начальное значение
+    TARGET_FRAME_LATENCY: Целевая задержка обработки одного кадра (секунды)
+    CPU_CEILING: Допустимая доля CPU для мониторинга (0.0 - 1.0) от ядер процесса
+                (под супервизором - ядер рабочего процесса), делится поровну между камерами процесса
+    MAX_SKIP_FRAMES: Верхняя граница шага, выбираемого регулятором
     MAX_DISPLAY_WIDTH: Максимальная ширина окна для отображения (пиксели)
                       Кадры масштабируются, если ширина превышает это значение
     FRAME_WIDTH: Ширина кадра камеры (пиксели)
@@ -25,6 +31,7 @@
     - CONFIDENCE_THRESHOLD: Начните с 0.25, увеличьте до 0.5-0.7 для уменьшения ложных срабатываний
     - DETECTION_IMG_SIZE: Используйте 640 для быстрой обработки, 1280 для высокой точности
     - SKIP_FRAMES: Увеличьте до 10-15 для слабых систем, уменьшите до 0-3 для мощных
+                  (при ADAPTIVE_SKIP_FRAMES = True подбирается автоматически)
     - MAX_DISPLAY_WIDTH: Установите в соответствии с разрешением вашего монитора
 
 Автор: [Ваше имя]
@@ -36,16 +43,110 @@ CONFIDENCE_THRESHOLD = 0.1
 DETECTION_IMG_SIZE = 640
 SKIP_FRAMES = 7
 MAX_DISPLAY_WIDTH = 2000
+DISPLAY_MAX_FPS = 15  # ограничение частоты отрисовки (не влияет на детекцию)
+PANEL_ALPHA = 0.6  # непрозрачность фона информационной панели
+SHELF_ALPHA = 0.7  # непрозрачность контуров полок
+MOSAIC_DISPLAY_SIZE = (1920, 1080)  # размер окна мозаики нескольких камер (width, height)
+MOSAIC_REFRESH_FPS = 10  # частота обновления окна мозаики
+
+# Адаптивный пропуск кадров
+ADAPTIVE_SKIP_FRAMES = True
+TARGET_FRAME_LATENCY = 0.5  # секунды
+CPU_CEILING = 0.8
+MAX_SKIP_FRAMES = 50
+GOVERNOR_ADJUST_INTERVAL = 5  # секунды между пересчетами шага
+GOVERNOR_REPORT_INTERVAL = 60  # секунды между отчетами о выбранной частоте
+
+# Временное сглаживание наполнения: 'ema', 'median', 'hysteresis' или None
+SMOOTHING_METHOD = 'ema'
+SMOOTHING_ALPHA = 0.3  # вес нового измерения для 'ema'
+SMOOTHING_WINDOW = 5  # количество измерений для 'median'
+SMOOTHING_HYSTERESIS = 3  # порог изменения (процентные пункты) для 'hysteresis'
+
+# Проверка качества кадра перед инференсом (смаз, темнота, перекрытие полки)
+QUALITY_GATE_ENABLED = True
+QUALITY_GATE_WIDTH = 320  # ширина уменьшенной копии кадра для проверок
+MIN_SHARPNESS = 50.0  # минимальная дисперсия Лапласиана в области полок
+MIN_BRIGHTNESS = 40  # минимальная средняя яркость (0 - 255)
+MAX_CHANGED_SHARE = 0.35  # максимальная доля изменившихся пикселей области полок
+CHANGE_PIXEL_THRESHOLD = 25  # порог изменения яркости пикселя
+OCCLUSION_PERSIST_FRAMES = 3  # через сколько кадров подряд изменение считается новой выкладкой
 
 
 # Разрешение камеры
 FRAME_WIDTH = 2000
 FRAME_HEIGHT = 2000
 
+# Сервер предпросмотра MJPEG для машин без монитора
+PREVIEW_HOST = '127.0.0.1'  # без авторизации: '0.0.0.0' открывает камеры магазина всей сети
+PREVIEW_PORT = 8080
+PREVIEW_JPEG_QUALITY = 70
+PREVIEW_MAX_FPS = 10  # максимальная частота для одного зрителя
+PREVIEW_MIN_FPS = 0.1  # минимальная частота для одного зрителя
+PREVIEW_MIN_WIDTH = 64  # минимальная ширина кадра, пиксели
+PREVIEW_MAX_CACHED = 8  # максимальное количество закодированных кадров (поток, ширина) в памяти
+
 # API настройки
 API_BASE_URL = 'http://localhost:8000' 
 
+# Фоновая отправка результатов на API
+UPLOAD_QUEUE_SIZE = 100  # максимальное количество результатов в очереди
+UPLOAD_TIMEOUT = 10  # секунды на один запрос
+UPLOAD_RETRIES = 3  # количество повторов при ошибке соединения или HTTP 5xx
+UPLOAD_BACKOFF = 1.0  # базовая задержка повторов (1, 2, 4 ... секунды)
+UPLOAD_WORKERS = 1  # количество потоков отправки
+
+# Кодирование изображений для отправки (MVP/upload/encoder.py)
+UPLOAD_MAX_DIMENSION = 1280  # максимальная сторона изображения в пикселях (None - без уменьшения)
+UPLOAD_JPEG_QUALITY = 80  # качество JPEG (0-100)
+UPLOAD_CROP_TO_SHELVES = False  # обрезать изображение по области полок
+UPLOAD_CROP_MARGIN = 20  # отступ вокруг области полок в пикселях
+
+# Локальное хранилище неотправленных результатов (когда API недоступен)
+SPOOL_ENABLED = True
+SPOOL_PATH = 'upload_spool.sqlite'
+SPOOL_MAX_BYTES = 500 * 1024 * 1024  # при превышении удаляются самые старые записи
+SPOOL_MAX_AGE = 7 * 24 * 3600  # секунды, записи старше удаляются
+SPOOL_BATCH_SIZE = 50  # количество записей, досылаемых за один проход
+SPOOL_RETRY_INTERVAL = 30  # секунды до повторной попытки после ошибки API
+
+# Пакетная отправка результатов всех камер процесса (MVP/upload/batch.py)
+BATCH_WINDOW = 60  # секунды накопления пакета
+BATCH_MAX_RECORDS = 500  # пакет отправляется досрочно при таком количестве записей
+
+# Политика отправки: только значимые изменения и контрольные отчеты (MVP/upload/report_policy.py)
+REPORT_DEAD_BAND = 5  # изменение наполнения (процентные пункты), которое считается значимым
+REPORT_DEAD_BANDS = {}  # индивидуальные значения {IP камеры: значение или [значение для каждой полки]}
+REPORT_MIN_INTERVAL = 60  # секунды, не чаще одного отчета камеры
+REPORT_MAX_INTERVAL = 900  # секунды, контрольный отчет даже без изменений
+REPORT_IMAGE_CHANGE = 20  # изменение, при котором к отчету прикладывается изображение
+REPORT_IMAGE_INTERVAL = 3600  # секунды, изображение не реже одного раза в этот интервал
+
 
 ID_STORE = 42013
 
+# Планировщик измерений по фиксированным тикам (MVP/schedule/tick_scheduler.py)
+TICK_STAGGER = True  # разносить камеры процесса равномерно по интервалу
+TICK_TOLERANCE = 1.0  # секунды опоздания, после которых тик считается пропущенным
+
+# Супервизор многокамерного запуска (MVP/supervisor/supervisor.py)
+FLEET_CONFIG_PATH = 'fleet.json'  # список камер магазина
+SUPERVISOR_WORKERS = None  # количество рабочих процессов (None - по числу ядер)
+SUPERVISOR_CORES_PER_WORKER = 2  # ядер CPU на один рабочий процесс
+SUPERVISOR_RESTART_BACKOFF = 5  # секунды до первого перезапуска упавшего процесса или камеры
+SUPERVISOR_MAX_BACKOFF = 300  # максимальная задержка перезапуска (секунды)
+SUPERVISOR_STABLE_TIME = 600  # секунды работы, после которых задержка перезапуска сбрасывается
+
+# Метрики времени этапов обработки (MVP/metrics/metrics.py)
+METRICS_ENABLED = True
+METRICS_HOST = '0.0.0.0'
+METRICS_PORT = 9108  # эндпоинт /metrics (рабочие процессы супервизора: METRICS_PORT + номер процесса)
+METRICS_REPORT_INTERVAL = 300  # секунды между сводками времени этапов в консоли
+
+# Расписание работы магазинов (часы работы, окна уборки и выкладки)
+# Если файл не найден, мониторинг работает круглосуточно
+STORE_SCHEDULE_PATH = 'store_schedule.json'
+# Количество кадров, которые пропускаются после возобновления работы камеры
+WARMUP_FRAMES = 5
+
 
@@ -0,0 +1,183 @@
+"""
+Модуль адаптивного регулятора пропуска кадров (governor).
+
+Вместо статической константы SKIP_FRAMES регулятор во время работы измеряет
+время декодирования и инференса каждого кадра и автоматически подбирает шаг
+обработки так, чтобы уложиться в заданный бюджет задержки и потолок загрузки CPU.
+
+Основные возможности:
+    - Измерение времени декодирования (read_frame) и инференса (YOLO) на кадр
+    - Автоматическое увеличение/уменьшение шага пропуска кадров
+    - Учет количества камер, работающих в одном процессе (бюджет ядер процесса делится между ними)
+    - Контроль фактической загрузки CPU процессом через time.process_time()
+    - Периодический вывод выбранной эффективной частоты обработки
+
+Классы:
+    FrameGovernor: Регулятор шага обработки кадров для одной камеры
+
+Методы FrameGovernor:
+    - should_process(): Нужно ли обрабатывать очередной декодированный кадр
+    - record_decode(seconds): Учет времени декодирования кадра
+    - record_inference(seconds): Учет времени инференса кадра
+    - release(): Снятие камеры с учета (при остановке потока)
+
+Алгоритм:
+    Раз в adjust_interval секунд регулятор считает загрузку камеры инференсом
+    в ядрах (busy = время инференса / длительность окна). Бюджет процесса -
+    CPU_CEILING от его ядер (affinity, под супервизором - ядра рабочего процесса),
+    доля камеры равна CPU_CEILING * ядра_процесса / камеры_процесса, тоже в ядрах.
+    Загрузка процесса считается от его ядер. Если busy превышает долю или процесс
+    превышает потолок CPU, шаг увеличивается. Если запас по обеим метрикам
+    больше 30%, шаг уменьшается на единицу (плавный возврат к более частой обработке).
+
+    Задержка обработки кадра (декодирование + инференс) от шага не зависит,
+    поэтому шаг из-за нее не увеличивается. Она ограничивает сверху полезную
+    частоту обработки (1 / задержка): шаг не уменьшается ниже значения, при
+    котором кадры поступали бы в модель чаще, чем она успевает их обработать,
+    если задержка выше TARGET_FRAME_LATENCY.
+
+Использование:
+    from MVP.governor.governor import FrameGovernor
+
+    governor = FrameGovernor(name=camera.ip_camera)
+    for frame, results in area.process_camera_stream(camera=camera, governor=governor):
+        pass
+    governor.release()
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import math
+import os
+import threading
+import time
+
+from MVP.config import SKIP_FRAMES, MAX_SKIP_FRAMES, TARGET_FRAME_LATENCY, CPU_CEILING, \
+    GOVERNOR_ADJUST_INTERVAL, GOVERNOR_REPORT_INTERVAL
+
+
+class FrameGovernor:
+    # Количество камер, зарегистрированных в текущем процессе
+    _active_cameras = 0
+    # Ядра, доступные процессу (None - по affinity процесса)
+    _process_cores = None
+    _lock = threading.Lock()
+
+    def __init__(self, name: str = None, target_latency: float = TARGET_FRAME_LATENCY,
+                 cpu_ceiling: float = CPU_CEILING, initial_skip: int = SKIP_FRAMES,
+                 max_skip: int = MAX_SKIP_FRAMES, adjust_interval: float = GOVERNOR_ADJUST_INTERVAL,
+                 report_interval: float = GOVERNOR_REPORT_INTERVAL):
+        self.name = name
+        self.target_latency = target_latency
+        self.cpu_ceiling = cpu_ceiling
+        self.max_skip = max_skip
+        self.skip_frames = min(max(0, initial_skip), max_skip)
+        self.adjust_interval = adjust_interval
+        self.report_interval = report_interval
+
+        self._frame_index = 0
+        self._released = False
+        self.effective_rate = 0.0
+        self._reset_window()
+        self._last_report = time.monotonic()
+
+        with FrameGovernor._lock:
+            FrameGovernor._active_cameras += 1
+
+    @classmethod
+    def active_cameras(cls) -> int:
+        return max(1, cls._active_cameras)
+
+    @classmethod
+    def set_process_cores(cls, count: int):
+        """Задает количество ядер процесса (супервизор - по ядрам рабочего процесса)"""
+        cls._process_cores = max(1, int(count))
+
+    @classmethod
+    def process_cores(cls) -> int:
+        if cls._process_cores is None:
+            if hasattr(os, 'sched_getaffinity'):
+                cls._process_cores = max(1, len(os.sched_getaffinity(0)))
+            else:
+                cls._process_cores = os.cpu_count() or 1
+        return cls._process_cores
+
+    def _reset_window(self):
+        """Начинает новое окно измерений"""
+        self._window_start = time.monotonic()
+        self._cpu_start = time.process_time()
+        self._decode_time = 0.0
+        self._decoded = 0
+        self._inference_time = 0.0
+        self._processed = 0
+
+    def should_process(self) -> bool:
+        """
+        Возвращает True, если очередной декодированный кадр нужно отправить в модель.
+        Вызывается один раз на каждый полученный кадр.
+        """
+        process = self._frame_index % (self.skip_frames + 1) == 0
+        self._frame_index += 1
+        return process
+
+    def record_decode(self, seconds: float):
+        self._decode_time += seconds
+        self._decoded += 1
+
+    def record_inference(self, seconds: float):
+        self._inference_time += seconds
+        self._processed += 1
+        self._maybe_adjust()
+
+    def _maybe_adjust(self):
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < self.adjust_interval or self._processed == 0:
+            return
+
+        cameras = FrameGovernor.active_cameras()
+        cores = FrameGovernor.process_cores()
+        # Доля камеры и загрузка в одних единицах - ядрах
+        share = self.cpu_ceiling * cores / cameras
+        busy = self._inference_time / elapsed
+        # Задержка обработки кадра: декодирование + инференс
+        decode_avg = self._decode_time / self._decoded if self._decoded else 0.0
+        latency = decode_avg + self._inference_time / self._processed
+        # Загрузка процесса - доля его ядер
+        process_cpu = (time.process_time() - self._cpu_start) / elapsed / cores
+
+        self.effective_rate = self._processed / elapsed
+        old_skip = self.skip_frames
+
+        # Минимальный полезный шаг: модель не обработает больше 1 / latency кадров в секунду
+        decode_rate = self._decoded / elapsed
+        latency_floor = 0
+        if latency > self.target_latency:
+            latency_floor = min(self.max_skip, max(0, math.ceil(decode_rate * latency) - 1))
+
+        if busy > share or process_cpu > self.cpu_ceiling:
+            # Шаг пропорционален перегрузке, но не меньше +1
+            ratio = max(busy / share, process_cpu / self.cpu_ceiling, 1.0)
+            required = math.ceil((self.skip_frames + 1) * ratio) - 1
+            self.skip_frames = min(self.max_skip, max(self.skip_frames + 1, required))
+        elif busy < share * 0.7 and process_cpu < self.cpu_ceiling * 0.7 and self.skip_frames > latency_floor:
+            self.skip_frames = max(latency_floor, self.skip_frames - 1)
+
+        now = time.monotonic()
+        if self.skip_frames != old_skip or now - self._last_report >= self.report_interval:
+            self._last_report = now
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Governor {self.name or ''}: "
+                  f"skip_frames {old_skip} -> {self.skip_frames}, "
+                  f"обработка {self.effective_rate:.2f} кадр/с, задержка {latency * 1000:.0f} мс, "
+                  f"загрузка {busy:.2f} ядра (доля {share:.2f}), CPU процесса {process_cpu:.0%} "
+                  f"из {cores} ядер, камер: {cameras}")
+
+        self._reset_window()
+
+    def release(self):
+        """Снимает камеру с учета, чтобы остальные камеры получили ее долю CPU"""
+        if self._released:
+            return
+        self._released = True
+        with FrameGovernor._lock:
+            FrameGovernor._active_cameras = max(0, FrameGovernor._active_cameras - 1)
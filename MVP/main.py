@@ -1,13 +1,24 @@
+"""
+Точка входа мониторинга полок магазина.
 
-from ultralytics.models import YOLO
+Запускает супервизор (MVP/supervisor/supervisor.py): все камеры из файла
+конфигурации распределяются по рабочим процессам, упавшие процессы и камеры
+перезапускаются.
 
-from MVP.camera.camera import Camera
-from MVP.show_picture.show_picture import ShowPicture
+Использование:
+    python -m MVP.main              # камеры из FLEET_CONFIG_PATH (config.py)
+    python -m MVP.main fleet.json   # камеры из указанного файла
 
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
 
-model_path= r'/my_best-shelf-void-model2026-01-27-16-53.pt'
-model = YOLO(model_path)
-json_path=r'C:\Users\ryabovva.VOLKOVKMR\PycharmProjects\learn_void_shelf\shot_20260123_193334_shelf_coordinates.json'
-camera = Camera(ip_camera='10.142.13.204')
-show = ShowPicture(model=model)
-show.start(camera=camera, json_path=json_path)
\ No newline at end of file
+import sys
+
+from MVP.config import FLEET_CONFIG_PATH
+from MVP.supervisor.supervisor import Supervisor
+
+
+if __name__ == '__main__':
+    fleet_path = sys.argv[1] if len(sys.argv) > 1 else FLEET_CONFIG_PATH
+    Supervisor(fleet_path).run()
@@ -0,0 +1,248 @@
+"""
+Модуль метрик: время этапов обработки по камерам и HTTP эндпоинт в формате Prometheus.
+
+Раньше единственным выводом был print в on_frame_processed, и по медленной
+машине магазина нельзя было понять, что ее ограничивает: декодирование,
+инференс, постобработка, отрисовка, кодирование изображений или отправка.
+Каждый этап измеряется монотонным таймером (time.perf_counter) и попадает в
+гистограмму с фиксированными корзинами по паре (этап, камера). Запись -
+один bisect и два сложения под общей блокировкой, без выделения памяти.
+
+Этапы (метрика shelf_stage_seconds, метка stage):
+    - decode: Camera.read_frame (получение и декодирование кадра)
+    - inference: вызов модели YOLO в AreaCalculator.calculate_shelf_fill_percentage
+    - postprocess: фильтрация объектов и расчет площадей (sweepline)
+    - render: отрисовка кадра в FrameRenderer
+    - encode: кодирование изображения для отправки (FrameEncoder)
+    - upload: HTTP запрос к API (UploadQueue.send)
+
+Счетчики:
+    - shelf_quality_frames_total{result}: результаты проверки качества кадров
+    - shelf_uploads_total{result}: успешные и неудачные отправки
+    - shelf_upload_image_bytes_total: объем отправленных изображений
+
+Классы:
+    Histogram: Гистограмма с фиксированными корзинами
+    MetricsRegistry: Хранилище метрик процесса
+
+Методы MetricsRegistry:
+    - timer(stage, camera): Контекстный менеджер для измерения этапа
+    - observe(stage, camera, seconds): Добавляет измерение
+    - inc(name, camera, value, **labels): Увеличивает счетчик
+    - render(): Текст в формате Prometheus
+    - summary(): Сводка для лога (среднее и p95 по этапам)
+    - serve(host, port): Запускает HTTP эндпоинт /metrics
+    - start_reporter(interval): Периодически выводит сводку в консоль
+
+Функции:
+    - get_metrics(): Общее хранилище метрик процесса
+
+Использование:
+    from MVP.metrics.metrics import get_metrics
+
+    metrics = get_metrics().serve().start_reporter()
+    with metrics.timer('inference', camera.ip_camera):
+        results = model(frame)
+    # curl http://<адрес машины>:9108/metrics
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from MVP.config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_REPORT_INTERVAL
+
+# Границы корзин гистограммы в секундах
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGES = ('decode', 'inference', 'postprocess', 'render', 'encode', 'upload')
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: dict) -> str:
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        # Последняя корзина - +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (этап, камера) -> Histogram
+        self._histograms = {}
+        # (имя, камера, метки) -> значение
+        self._counters = {}
+        self._server = None
+        self._reporter = None
+
+    @contextmanager
+    def timer(self, stage: str, camera=None):
+        """Измеряет время выполнения блока и добавляет его в гистограмму этапа"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, camera, time.perf_counter() - start)
+
+    def observe(self, stage: str, camera, seconds: float):
+        if not self.enabled:
+            return
+        key = (stage, camera or '')
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, camera=None, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, camera or '', tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus"""
+        with self._lock:
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(self._histograms.items())]
+            counters = sorted(self._counters.items())
+
+        lines = [
+            '# HELP shelf_stage_seconds Время этапа обработки кадра',
+            '# TYPE shelf_stage_seconds histogram',
+        ]
+        for (stage, camera), counts, total, count in histograms:
+            labels = _labels({'camera': camera, 'stage': stage})
+            cumulative = 0
+            for bound, bucket_count in zip(STAGE_BUCKETS + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'shelf_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'shelf_stage_seconds_sum{{{labels}}} {total}')
+            lines.append(f'shelf_stage_seconds_count{{{labels}}} {count}')
+
+        typed = set()
+        for (name, camera, extra), value in counters:
+            metric = f'shelf_{name}'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} counter')
+                typed.add(metric)
+            lines.append(f'{metric}{{{_labels(dict({"camera": camera}, **dict(extra)))}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Сводка по камерам: среднее и p95 каждого этапа в миллисекундах"""
+        with self._lock:
+            stages = {}
+            for (stage, camera), histogram in self._histograms.items():
+                if histogram.count:
+                    stages.setdefault(camera, []).append(
+                        (STAGES.index(stage) if stage in STAGES else len(STAGES), stage,
+                         histogram.sum / histogram.count * 1000, histogram.quantile(0.95) * 1000,
+                         histogram.count)
+                    )
+
+        lines = []
+        for camera in sorted(stages):
+            parts = [f"{stage} {avg:.1f}/{p95:.0f} мс (n={count})"
+                     for _, stage, avg, p95, count in sorted(stages[camera])]
+            lines.append(f"  {camera or 'без камеры'}: {', '.join(parts)}")
+        return '\n'.join(lines)
+
+    def _report(self, interval: float):
+        while True:
+            time.sleep(interval)
+            summary = self.summary()
+            if summary:
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Время этапов (среднее/p95):\n{summary}")
+
+    def start_reporter(self, interval: float = METRICS_REPORT_INTERVAL):
+        """Запускает фоновый вывод сводки в консоль раз в interval секунд"""
+        if self.enabled and self._reporter is None:
+            self._reporter = threading.Thread(target=self._report, args=(interval,), name='metrics-reporter',
+                                              daemon=True)
+            self._reporter.start()
+        return self
+
+    def serve(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """Запускает HTTP эндпоинт /metrics в фоновом потоке"""
+        if not self.enabled or self._server is not None:
+            return self
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        print(f"Метрики: http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Возвращает общее для процесса хранилище метрик"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
@@ -0,0 +1,299 @@
+"""
+Модуль HTTP сервера предпросмотра (MJPEG) для удаленной отладки.
+
+Магазинные машины работают без монитора, поэтому окно cv2.imshow в
+ShowPicture.start на них бесполезно. PreviewServer - встроенный легкий
+HTTP сервер, который отдает отрисованные кадры в формате MJPEG
+(multipart/x-mixed-replace) и открывается в любом браузере.
+
+Основные возможности:
+    - JPEG кодируется только пока подключен хотя бы один зритель
+      (без зрителей FrameRenderer вообще не рисует кадры)
+    - Один закодированный кадр используется всеми зрителями с одинаковыми параметрами
+    - Каждый зритель может запросить меньшее разрешение (?width=) и частоту (?fps=);
+      некорректные значения получают ответ 400, допустимые ограничиваются диапазоном
+    - В памяти хранится не более PREVIEW_MAX_CACHED закодированных кадров
+    - Сервер работает в фоновом потоке и не влияет на цикл детекции
+
+Классы:
+    PreviewServer: HTTP сервер предпросмотра, приемник (sink) для FrameRenderer
+
+Адреса:
+    /                        - список потоков
+    /stream/<имя>?width=&fps= - MJPEG поток
+    /snapshot/<имя>?width=    - один JPEG кадр
+
+Использование:
+    from MVP.preview.preview_server import PreviewServer
+
+    preview = PreviewServer().start()
+    show.start_in_store(camera=camera, shelf_coordinates=shelves, id_store=ID_STORE, sinks=[preview])
+    # Открыть в браузере: http://localhost:8080/stream/<IP камеры>?width=640&fps=2
+
+    Авторизации нет, поэтому по умолчанию сервер слушает только 127.0.0.1 (PREVIEW_HOST).
+    Удаленно - через SSH туннель: ssh -L 8080:127.0.0.1:8080 <машина магазина>
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import html
+import math
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote, quote
+
+import cv2
+
+from MVP.config import PREVIEW_HOST, PREVIEW_PORT, PREVIEW_JPEG_QUALITY, PREVIEW_MAX_FPS, PREVIEW_MIN_FPS, \
+    PREVIEW_MIN_WIDTH, PREVIEW_MAX_CACHED
+
+BOUNDARY = 'frame'
+
+
+def parse_width(query: dict):
+    """Ширина кадра из ?width=. None - исходная ширина, ValueError - некорректное значение"""
+    if 'width' not in query:
+        return None
+    width = int(query['width'][0])
+    if width <= 0:
+        raise ValueError(f"width должен быть положительным: {width}")
+    return max(width, PREVIEW_MIN_WIDTH)
+
+
+def parse_fps(query: dict, max_fps: float) -> float:
+    """Частота кадров из ?fps=, ограниченная [PREVIEW_MIN_FPS, max_fps]. ValueError - некорректное значение"""
+    if 'fps' not in query:
+        return max_fps
+    fps = float(query['fps'][0])
+    if not math.isfinite(fps) or fps <= 0:
+        raise ValueError(f"fps должен быть положительным: {fps}")
+    return min(max(fps, PREVIEW_MIN_FPS), max_fps)
+
+
+class PreviewServer:
+    def __init__(self, host: str = PREVIEW_HOST, port: int = PREVIEW_PORT,
+                 jpeg_quality: int = PREVIEW_JPEG_QUALITY, max_fps: float = PREVIEW_MAX_FPS,
+                 max_cached: int = PREVIEW_MAX_CACHED):
+        self.host = host
+        self.port = port
+        self.jpeg_quality = jpeg_quality
+        self.max_fps = max_fps
+        self.max_cached = max_cached
+
+        self._clients = 0
+        self._condition = threading.Condition()
+        # Последний кадр потока: имя -> (номер кадра, кадр)
+        self._frames = {}
+        # Закодированные кадры: (имя, ширина) -> (номер кадра, jpeg bytes)
+        self._jpegs = {}
+        self._encode_locks = {}
+        self._server = None
+        self._thread = None
+
+    @property
+    def attached(self) -> bool:
+        """FrameRenderer рисует кадры для сервера, только пока есть зрители"""
+        return self._clients > 0
+
+    def push(self, name, frame):
+        """Сохраняет последний отрисованный кадр потока (без кодирования)"""
+        with self._condition:
+            seq = self._frames.get(name, (0, None))[0] + 1
+            self._frames[name] = (seq, frame)
+            self._condition.notify_all()
+
+    def register(self, name):
+        """Добавляет поток в список до получения первого кадра (вызывается FrameRenderer)"""
+        with self._condition:
+            self._frames.setdefault(name, (0, None))
+
+    def streams(self) -> list:
+        with self._condition:
+            return list(self._frames)
+
+    def has_stream(self, name) -> bool:
+        with self._condition:
+            return name in self._frames
+
+    def _wait_frame(self, name, last_seq, timeout=5.0):
+        """Ждет кадр новее last_seq. Возвращает номер кадра или None по таймауту"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._frames.get(name, (0, None))[0] > last_seq, timeout=timeout)
+            seq = self._frames.get(name, (0, None))[0]
+            return seq if seq > last_seq else None
+
+    def jpeg(self, name, width: int = None):
+        """
+        Возвращает (номер кадра, JPEG) для потока в нужной ширине.
+        Кадр кодируется один раз для каждой пары (поток, ширина) и
+        используется всеми зрителями с такими параметрами.
+        """
+        with self._condition:
+            seq, frame = self._frames.get(name, (0, None))
+            if frame is None:
+                return 0, None
+            # Ширина не меньше исходной - один общий кадр без уменьшения
+            if width and width >= frame.shape[1]:
+                width = None
+            key = (name, width)
+            lock = self._encode_locks.get(key)
+            if lock is None:
+                if len(self._encode_locks) >= self.max_cached:
+                    # Вытесняется самая старая пара (поток, ширина)
+                    oldest = next(iter(self._encode_locks))
+                    del self._encode_locks[oldest]
+                    self._jpegs.pop(oldest, None)
+                lock = self._encode_locks[key] = threading.Lock()
+
+        with lock:
+            cached = self._jpegs.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached
+            height, frame_width = frame.shape[:2]
+            if width:
+                frame = cv2.resize(frame, (width, int(height * width / frame_width)), interpolation=cv2.INTER_AREA)
+            success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not success:
+                return seq, None
+            cached = (seq, buffer.tobytes())
+            with self._condition:
+                # Пара могла быть вытеснена, пока кадр кодировался
+                if key in self._encode_locks:
+                    self._jpegs[key] = cached
+            return cached
+
+    def _client_connected(self):
+        with self._condition:
+            self._clients += 1
+
+    def _client_disconnected(self):
+        with self._condition:
+            self._clients -= 1
+            if self._clients == 0:
+                # Без зрителей закодированные кадры не нужны
+                self._jpegs.clear()
+                self._encode_locks.clear()
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+                try:
+                    width = parse_width(query)
+                    fps = parse_fps(query, server.max_fps)
+                except ValueError as error:
+                    self.send_error(400, str(error))
+                    return
+
+                if not parts:
+                    self._index()
+                elif parts[0] == 'stream' and len(parts) == 2:
+                    self._stream(parts[1], width, fps)
+                elif parts[0] == 'snapshot' and len(parts) == 2:
+                    self._snapshot(parts[1], width)
+                else:
+                    self.send_error(404)
+
+            def _index(self):
+                links = ''.join(
+                    f'<h3>{html.escape(name)}</h3><img src="/stream/{html.escape(quote(name, safe=""))}?width=640">'
+                    for name in server.streams()
+                )
+                body = f'<html><body><h2>Shelf Monitoring</h2>{links}</body></html>'.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _snapshot(self, name, width):
+                server._client_connected()
+                try:
+                    # Без зрителей кадры не рисуются - ждем первый кадр после подключения
+                    if server._wait_frame(name, 0) is None:
+                        self.send_error(404)
+                        return
+                    _, jpeg = server.jpeg(name, width)
+                    if jpeg is None:
+                        self.send_error(500)
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/jpeg')
+                    self.send_header('Content-Length', str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                finally:
+                    server._client_disconnected()
+
+            def _client_gone(self) -> bool:
+                """Зритель закрыл соединение: сокет читается, но данных нет (EOF)"""
+                try:
+                    readable, _, _ = select.select([self.connection], [], [], 0)
+                    return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+                except OSError:
+                    return True
+
+            def _stream(self, name, width, fps):
+                if not server.has_stream(name):
+                    self.send_error(404)
+                    return
+                period = 1.0 / fps
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+
+                server._client_connected()
+                last_seq = 0
+                try:
+                    while server._server is not None:
+                        seq = server._wait_frame(name, last_seq)
+                        if seq is None:
+                            # Без новых кадров запись не выполняется - отключение зрителя проверяется явно
+                            if self._client_gone():
+                                break
+                            continue
+                        seq, jpeg = server.jpeg(name, width)
+                        last_seq = seq
+                        if jpeg is None:
+                            continue
+                        sent_at = time.monotonic()
+                        self.wfile.write(
+                            f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                            f'Content-Length: {len(jpeg)}\r\n\r\n'.encode('ascii')
+                        )
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b'\r\n')
+                        # Ограничение частоты для конкретного зрителя
+                        delay = sent_at + period - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                except OSError:
+                    # Зритель отключился во время записи (BrokenPipe, ConnectionReset, ConnectionAborted)
+                    pass
+                finally:
+                    server._client_disconnected()
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='preview-server', daemon=True)
+        self._thread.start()
+        print(f"Сервер предпросмотра запущен: http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,132 @@
+"""
+Модуль проверки качества кадра перед инференсом.
+
+Кадры со смазом, выключенным светом или покупателем, стоящим перед полкой,
+проходят полный инференс YOLO и дают шумные значения наполнения. Этот модуль
+выполняет дешевую проверку декодированного кадра до запуска модели и
+отбраковывает такие кадры.
+
+Проверки (выполняются на уменьшенной копии кадра в оттенках серого):
+    - dark: средняя яркость ниже MIN_BRIGHTNESS (свет выключен)
+    - blur: дисперсия Лапласиана в области полок ниже MIN_SHARPNESS (смаз)
+    - occluded: доля пикселей области полок, изменившихся относительно последнего
+                принятого кадра, больше MAX_CHANGED_SHARE (полку загораживают).
+                Если изменение держится OCCLUSION_PERSIST_FRAMES кадров подряд,
+                это считается новой выкладкой, и кадр принимается как новый эталон
+
+Классы:
+    FrameQualityGate: Проверка качества кадров одной камеры
+
+Методы FrameQualityGate:
+    - check(frame, shelf_coordinates): Возвращает причину отбраковки или None
+    - summary(): Строка со счетчиками принятых и отбракованных кадров
+
+Метрики:
+    Атрибуты passed и rejected ({'dark': n, 'blur': n, 'occluded': n}) содержат
+    счетчики по причинам отбраковки.
+
+Использование:
+    from MVP.quality.quality_gate import FrameQualityGate
+
+    gate = FrameQualityGate(name=camera.ip_camera)
+    reason = gate.check(frame, shelf_coordinates)
+    if reason is None:
+        results = area.calculate_shelf_fill_percentage(frame, shelf_coordinates)
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from MVP.metrics.metrics import get_metrics
+from MVP.config import MIN_SHARPNESS, MIN_BRIGHTNESS, MAX_CHANGED_SHARE, CHANGE_PIXEL_THRESHOLD, \
+    OCCLUSION_PERSIST_FRAMES, QUALITY_GATE_WIDTH
+
+
+class FrameQualityGate:
+    def __init__(self, name: str = None, min_sharpness: float = MIN_SHARPNESS,
+                 min_brightness: float = MIN_BRIGHTNESS, max_changed_share: float = MAX_CHANGED_SHARE,
+                 change_threshold: int = CHANGE_PIXEL_THRESHOLD,
+                 persist_frames: int = OCCLUSION_PERSIST_FRAMES, width: int = QUALITY_GATE_WIDTH):
+        self.name = name
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_changed_share = max_changed_share
+        self.change_threshold = change_threshold
+        self.persist_frames = persist_frames
+        self.width = width
+
+        self.passed = 0
+        self.rejected = {'dark': 0, 'blur': 0, 'occluded': 0}
+
+        self._reference = None
+        self._changed_streak = 0
+        # Маска полок кэшируется для размера кадра
+        self._mask_key = None
+        self._mask = None
+
+    def _shelf_mask(self, small_shape, frame_shape, shelf_coordinates) -> np.ndarray:
+        key = (small_shape, frame_shape, tuple(shelf_coordinates or ()))
+        if key != self._mask_key:
+            height, width = small_shape
+            mask = np.zeros(small_shape, dtype=bool)
+            if shelf_coordinates:
+                scale = width / frame_shape[1]
+                for x1, y1, x2, y2 in shelf_coordinates:
+                    mask[max(0, int(y1 * scale)):min(height, int(y2 * scale) + 1),
+                         max(0, int(x1 * scale)):min(width, int(x2 * scale) + 1)] = True
+            if not mask.any():
+                mask[:] = True
+            self._mask_key = key
+            self._mask = mask
+        return self._mask
+
+    def check(self, frame: np.ndarray,
+              shelf_coordinates: List[Tuple[float, float, float, float]] = None) -> Optional[str]:
+        """
+        Проверяет кадр перед инференсом.
+
+        Returns:
+            None, если кадр пригоден, иначе причина отбраковки: 'dark', 'blur' или 'occluded'
+        """
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        mask = self._shelf_mask(gray.shape, frame.shape[:2], shelf_coordinates)
+
+        reason = None
+        if gray.mean() < self.min_brightness:
+            reason = 'dark'
+        elif cv2.Laplacian(gray, cv2.CV_64F)[mask].var() < self.min_sharpness:
+            reason = 'blur'
+        elif self._reference is not None and self._reference.shape == gray.shape:
+            diff = cv2.absdiff(gray, self._reference)[mask]
+            changed_share = np.count_nonzero(diff > self.change_threshold) / diff.size
+            if changed_share > self.max_changed_share:
+                self._changed_streak += 1
+                # Долгое изменение - это новая выкладка, а не человек перед полкой
+                if self._changed_streak < self.persist_frames:
+                    reason = 'occluded'
+            else:
+                self._changed_streak = 0
+
+        if reason is not None:
+            self.rejected[reason] += 1
+            get_metrics().inc('quality_frames_total', self.name, result=reason)
+            return reason
+
+        self._changed_streak = 0
+        self._reference = gray
+        self.passed += 1
+        get_metrics().inc('quality_frames_total', self.name, result='passed')
+        return None
+
+    def summary(self) -> str:
+        rejected = ', '.join(f"{reason}={count}" for reason, count in self.rejected.items())
+        return f"Качество кадров {self.name or ''}: принято {self.passed}, отбраковано: {rejected}"
@@ -0,0 +1,190 @@
+"""
+Модуль расписания работы магазина для мониторинга полок.
+
+Ночью и в нерабочее время полки темные и неподвижные, поэтому нет смысла
+получать кадры и запускать YOLO модель. Этот модуль описывает расписание
+магазина (часы работы, окна уборки и выкладки товара) и определяет, в каком
+режиме должна работать камера в данный момент.
+
+Режимы работы:
+    - active: обычный мониторинг
+    - throttled: мониторинг с увеличенным интервалом (interval * throttle_factor)
+    - suspended: захват кадров и инференс приостановлены, камера отключена
+
+Классы:
+    StoreSchedule: Расписание одной камеры магазина
+
+Функции:
+    - load_store_schedule(): Загружает расписание для пары (ID магазина, IP камеры)
+
+Формат JSON файла расписаний (STORE_SCHEDULE_PATH в config.py):
+    {
+        "default": {
+            "opening_hours": {"default": ["08:00", "22:00"], "sun": ["10:00", "20:00"]},
+            "closed_mode": "suspended",
+            "throttle_factor": 5
+        },
+        "stores": {
+            "42013": {
+                "opening_hours": {"default": ["07:00", "23:00"]},
+                "windows": [
+                    {"name": "cleaning", "start": "23:00", "end": "23:30", "mode": "suspended"},
+                    {"name": "restock", "start": "06:00", "end": "07:00", "mode": "throttled",
+                     "days": ["mon", "thu"]}
+                ],
+                "cameras": {
+                    "10.142.13.204": {"opening_hours": {"default": ["00:00", "24:00"]}}
+                }
+            }
+        }
+    }
+
+    Настройки камеры перекрывают настройки магазина, настройки магазина -
+    настройки по умолчанию. Интервалы могут переходить через полночь
+    (например, ["20:00", "02:00"]). Окна проверяются раньше часов работы.
+
+Использование:
+    from MVP.schedule.store_schedule import load_store_schedule
+
+    schedule = load_store_schedule(id_store=42013, ip_camera='10.142.13.204')
+    state = schedule.state()
+    if state == 'suspended':
+        time.sleep(schedule.seconds_until_change())
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from MVP.config import STORE_SCHEDULE_PATH
+
+ACTIVE = 'active'
+THROTTLED = 'throttled'
+SUSPENDED = 'suspended'
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def _parse_time(value: str) -> int:
+    """Переводит строку 'HH:MM' в минуты от начала суток ('24:00' = 1440)"""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _in_interval(minute: int, start: int, end: int) -> bool:
+    """Проверяет попадание в интервал [start, end), в том числе через полночь"""
+    if start == end:
+        return False
+    if start < end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+class StoreSchedule:
+    def __init__(self, opening_hours: dict = None, windows: list = None,
+                 closed_mode: str = SUSPENDED, throttle_factor: float = 5):
+        """
+        Args:
+            opening_hours: Часы работы {'default' | 'mon'..'sun': ['HH:MM', 'HH:MM']}.
+                           Если None, магазин считается открытым круглосуточно
+            windows: Окна уборки/выкладки [{'start', 'end', 'mode', 'days'?, 'name'?}, ...]
+            closed_mode: Режим вне часов работы ('suspended' или 'throttled')
+            throttle_factor: Во сколько раз увеличивается интервал в режиме 'throttled'
+        """
+        self.opening_hours = {
+            day: (_parse_time(start), _parse_time(end))
+            for day, (start, end) in (opening_hours or {}).items()
+        }
+        self.windows = [
+            {
+                'name': window.get('name', ''),
+                'start': _parse_time(window['start']),
+                'end': _parse_time(window['end']),
+                'mode': window.get('mode', SUSPENDED),
+                'days': window.get('days'),
+            }
+            for window in (windows or [])
+        ]
+        self.closed_mode = closed_mode
+        self.throttle_factor = throttle_factor
+
+    def state(self, now: Optional[datetime] = None) -> str:
+        """Возвращает режим работы камеры в момент now (по умолчанию - текущее время)"""
+        now = now or datetime.now()
+        day = DAYS[now.weekday()]
+        minute = now.hour * 60 + now.minute
+
+        for window in self.windows:
+            if window['days'] and day not in window['days']:
+                continue
+            if _in_interval(minute, window['start'], window['end']):
+                return window['mode']
+
+        if not self.opening_hours:
+            return ACTIVE
+
+        hours = self.opening_hours.get(day, self.opening_hours.get('default'))
+        if hours is None:
+            return self.closed_mode
+        start, end = hours
+        if end - start >= 1440 or _in_interval(minute, start, end):
+            return ACTIVE
+        return self.closed_mode
+
+    def interval(self, base_interval: float, now: Optional[datetime] = None) -> float:
+        """Интервал между измерениями с учетом режима работы"""
+        if self.state(now) == THROTTLED:
+            return base_interval * self.throttle_factor
+        return base_interval
+
+    def seconds_until_change(self, now: Optional[datetime] = None, limit: int = 3600) -> float:
+        """
+        Возвращает количество секунд до ближайшей смены режима (не больше limit).
+        Используется, чтобы спать в режиме 'suspended' без лишних пробуждений.
+        """
+        now = now or datetime.now()
+        current = self.state(now)
+        # Режимы меняются на границах минут, поэтому достаточно проверять начало каждой минуты
+        probe = now.replace(second=0, microsecond=0)
+        for _ in range(limit // 60):
+            probe += timedelta(minutes=1)
+            if self.state(probe) != current:
+                return max(1.0, (probe - now).total_seconds())
+        return float(limit)
+
+
+def load_store_schedule(id_store: int, ip_camera: str = None,
+                        path: str = STORE_SCHEDULE_PATH) -> StoreSchedule:
+    """
+    Загружает расписание для камеры магазина из JSON файла.
+
+    Args:
+        id_store: ID магазина
+        ip_camera: IP адрес камеры (для индивидуальных настроек камеры)
+        path: Путь к JSON файлу расписаний
+
+    Returns:
+        StoreSchedule. Если файл не найден, возвращается круглосуточное расписание
+    """
+    if not path or not os.path.exists(path):
+        return StoreSchedule()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    config = dict(data.get('default', {}))
+    store = data.get('stores', {}).get(str(id_store), {})
+    config.update({key: value for key, value in store.items() if key != 'cameras'})
+    if ip_camera is not None:
+        config.update(store.get('cameras', {}).get(ip_camera, {}))
+
+    return StoreSchedule(
+        opening_hours=config.get('opening_hours'),
+        windows=config.get('windows'),
+        closed_mode=config.get('closed_mode', SUSPENDED),
+        throttle_factor=config.get('throttle_factor', 5),
+    )
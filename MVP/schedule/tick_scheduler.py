@@ -0,0 +1,157 @@
+"""
+Модуль планировщика измерений по фиксированным тикам с разнесением камер.
+
+Раньше run_periodic и start_in_store вызывали time.sleep(interval) после
+выполнения работы, поэтому реальный период равнялся interval плюс время
+инференса и отправки и постепенно уплывал. Камеры, запущенные одновременно,
+к тому же срабатывали в один и тот же момент, и нагрузка на CPU
+многокамерной машины шла пиками. TickScheduler - общий для процесса
+планировщик: каждая камера просыпается на фиксированных тиках по часам
+(k * interval + фаза), а фазы N камер равномерно разнесены по интервалу.
+
+Основные возможности:
+    - Тики не зависят от длительности работы: период не уплывает
+    - Камеры процесса разнесены по интервалу (фаза = номер камеры / N * interval)
+    - Пропущенные тики (работа длилась дольше интервала) не догоняются пачкой,
+      а пропускаются с сообщением в консоль и учитываются в статистике
+    - Смена интервала (режим throttled) и пауза по расписанию выравнивают
+      камеру на новую сетку без ложных сообщений о пропусках
+
+Классы:
+    TickScheduler: Планировщик тиков для всех камер процесса
+
+Методы TickScheduler:
+    - register(key) / unregister(key): Добавляет и удаляет камеру (фазы пересчитываются)
+    - wait(key, interval): Блокирует до следующего тика камеры
+    - reset(key): Сбрасывает последний тик камеры (например, после ночной паузы)
+    - stats(): Статистика тиков и пропусков по камерам
+
+Функции:
+    - get_tick_scheduler(): Общий планировщик процесса
+
+Использование:
+    from MVP.schedule.tick_scheduler import get_tick_scheduler
+
+    ticker = get_tick_scheduler()
+    ticker.register(camera.ip_camera)
+    while True:
+        ticker.wait(camera.ip_camera, 60)
+        ...  # измерение
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import math
+import threading
+import time
+
+from MVP.config import TICK_STAGGER, TICK_TOLERANCE
+
+
+class TickScheduler:
+    def __init__(self, stagger: bool = TICK_STAGGER, tolerance: float = TICK_TOLERANCE):
+        """
+        Args:
+            stagger: Разносить камеры процесса по интервалу
+            tolerance: Опоздание (секунды), при котором тик еще выполняется, а не считается пропущенным
+        """
+        self.stagger = stagger
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        # Камеры в порядке регистрации: ключ -> состояние
+        self._slots = {}
+
+    def register(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = {'last_tick': None, 'interval': None, 'ticks': 0, 'missed': 0,
+                                    'max_late': 0.0}
+
+    def unregister(self, key):
+        with self._lock:
+            self._slots.pop(key, None)
+
+    def reset(self, key):
+        """Следующий тик камеры выбирается заново, без учета пропусков"""
+        with self._lock:
+            if key in self._slots:
+                self._slots[key]['last_tick'] = None
+
+    def _phase(self, key, interval: float) -> float:
+        if not self.stagger:
+            return 0.0
+        keys = list(self._slots)
+        return keys.index(key) / len(keys) * interval
+
+    def _next_tick(self, key, interval: float, now: float) -> float:
+        """Выбирает следующий тик камеры и учитывает пропущенные тики"""
+        slot = self._slots[key]
+        phase = self._phase(key, interval)
+        last = slot['last_tick']
+        aligned = last is not None and slot['interval'] == interval
+        # Не раньше чем через пол-интервала после прошлого тика: при регистрации
+        # новой камеры фазы сдвигаются, и камера не должна сработать дважды подряд
+        earliest = last + interval / 2 if aligned else now
+        tick = math.ceil((earliest - phase) / interval) * interval + phase
+
+        if tick - now > interval:
+            # Часы переведены назад - выравниваемся заново
+            tick = math.ceil((now - phase) / interval) * interval + phase
+        elif aligned and tick < now - self.tolerance:
+            missed = math.ceil((now - self.tolerance - tick) / interval)
+            tick += missed * interval
+            slot['missed'] += missed
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Камера {key}: пропущено тиков: {missed} "
+                  f"(измерение длилось дольше интервала {interval:g} с), всего {slot['missed']}")
+
+        slot['last_tick'] = tick
+        slot['interval'] = interval
+        slot['ticks'] += 1
+        return tick
+
+    def wait(self, key, interval: float) -> float:
+        """
+        Блокирует до следующего тика камеры.
+
+        Args:
+            key: Ключ камеры (обычно IP). Незарегистрированная камера регистрируется автоматически
+            interval: Период измерений в секундах
+
+        Returns:
+            Время тика (time.time())
+        """
+        self.register(key)
+        with self._lock:
+            tick = self._next_tick(key, interval, time.time())
+
+        delay = tick - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+        late = time.time() - tick
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                slot['max_late'] = max(slot['max_late'], late)
+        return tick
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                key: {'ticks': slot['ticks'], 'missed': slot['missed'], 'max_late': slot['max_late']}
+                for key, slot in self._slots.items()
+            }
+
+
+_tick_scheduler = None
+_tick_scheduler_lock = threading.Lock()
+
+
+def get_tick_scheduler() -> TickScheduler:
+    """Возвращает общий для процесса планировщик тиков"""
+    global _tick_scheduler
+    with _tick_scheduler_lock:
+        if _tick_scheduler is None:
+            _tick_scheduler = TickScheduler()
+        return _tick_scheduler
@@ -0,0 +1,167 @@
+"""
+Модуль мозаики для просмотра нескольких камер в одном окне.
+
+Вместо нескольких циклов ShowPicture.start с отдельными окнами cv2.imshow
+оператор видит все камеры в одной сетке. MosaicViewer подключается к
+FrameRenderer каждой камеры как приемник (sink) и хранит последний
+отрисованный кадр каждого потока. Окно обновляется по собственному таймеру
+(MOSAIC_REFRESH_FPS) независимо от частоты инференса камер.
+
+Основные возможности:
+    - Сетка из N потоков в одном окне с разрешением MOSAIC_DISPLAY_SIZE
+    - Кадр каждой камеры масштабируется один раз сразу под размер своей ячейки
+      (FrameRenderer запрашивает размер ячейки через slot_size() перед каждой отрисовкой,
+      поэтому после изменения сетки кадры сразу рисуются под новый размер)
+    - Холст создается один раз, в него копируются только обновленные ячейки
+    - Обновление окна по фиксированному таймеру
+
+Классы:
+    MosaicViewer: Окно-мозаика для нескольких камер
+
+Методы MosaicViewer:
+    - slot_size(name): Размер ячейки для потока (регистрирует поток)
+    - push(name, frame): Сохраняет последний отрисованный кадр потока
+    - run(): Цикл обновления окна в текущем потоке (блокирующий)
+    - start() / stop(): Запуск и остановка цикла обновления в фоновом потоке
+
+Использование:
+    import threading
+    from MVP.show_picture.mosaic import MosaicViewer
+
+    viewer = MosaicViewer(names=['10.142.13.195', '10.142.13.204'])
+    # Одна модель на все потоки: AreaCalculator выполняет инференс под своей блокировкой
+    show = ShowPicture(model=YOLO(model_path))
+    for camera, json_path in cameras:
+        threading.Thread(target=show.start, daemon=True,
+                         kwargs={'camera': camera, 'json_path': json_path,
+                                 'video': False, 'sinks': [viewer]}).start()
+    viewer.run()  # 'q' или ESC закрывает окно и останавливает потоки камер
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from MVP.config import MOSAIC_DISPLAY_SIZE, MOSAIC_REFRESH_FPS
+
+
+class MosaicViewer:
+    def __init__(self, names: list = None, display_size: tuple = MOSAIC_DISPLAY_SIZE,
+                 refresh_fps: float = MOSAIC_REFRESH_FPS, window_name: str = 'Shelf Monitoring - Mosaic'):
+        """
+        Args:
+            names: Имена потоков (обычно IP камер) в порядке расположения в сетке.
+                   Потоки, не указанные заранее, добавляются в конец при первом кадре
+            display_size: Размер окна (width, height)
+            refresh_fps: Частота обновления окна
+            window_name: Заголовок окна
+        """
+        self.display_width, self.display_height = display_size
+        self.refresh_period = 1.0 / refresh_fps
+        self.window_name = window_name
+        self.attached = True
+        self.stopped = False
+
+        self._lock = threading.Lock()
+        self._names = []
+        self._latest = {}
+        self._dirty = set()
+        self._thread = None
+        self._canvas = np.zeros((self.display_height, self.display_width, 3), dtype=np.uint8)
+        self._layout()
+        for name in names or []:
+            self._register(name)
+
+    def _layout(self):
+        """Пересчитывает сетку под текущее количество потоков"""
+        count = max(1, len(self._names))
+        self.cols = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.cols)
+        self.slot_width = self.display_width // self.cols
+        self.slot_height = self.display_height // self.rows
+
+    def _register(self, name):
+        if name in self._names:
+            return
+        self._names.append(name)
+        old_slots = (self.cols, self.rows)
+        self._layout()
+        if (self.cols, self.rows) != old_slots:
+            # Сетка изменилась - перерисовываем холст целиком
+            self._canvas[:] = 0
+            self._dirty.update(self._latest)
+
+    def slot_size(self, name) -> tuple:
+        """Возвращает размер ячейки (width, height) и регистрирует поток в сетке"""
+        with self._lock:
+            self._register(name)
+            return self.slot_width, self.slot_height
+
+    def push(self, name, frame):
+        """Сохраняет последний отрисованный кадр потока (вызывается из FrameRenderer)"""
+        with self._lock:
+            self._register(name)
+            self._latest[name] = frame
+            self._dirty.add(name)
+
+    def compose(self) -> np.ndarray:
+        """Копирует обновленные кадры в их ячейки и возвращает холст"""
+        with self._lock:
+            dirty = [(self._names.index(name), self._latest[name]) for name in self._dirty]
+            self._dirty.clear()
+            slot_width, slot_height, cols = self.slot_width, self.slot_height, self.cols
+
+        for index, frame in dirty:
+            height, width = frame.shape[:2]
+            if width > slot_width or height > slot_height:
+                # Размер ячейки изменился после отрисовки кадра - единственный ресайз
+                scale = min(slot_width / width, slot_height / height)
+                frame = cv2.resize(frame, (int(width * scale), int(height * scale)),
+                                   interpolation=cv2.INTER_AREA)
+                height, width = frame.shape[:2]
+            x = (index % cols) * slot_width
+            y = (index // cols) * slot_height
+            slot = self._canvas[y:y + slot_height, x:x + slot_width]
+            slot[:] = 0
+            # Кадр центрируется в ячейке
+            dx = (slot_width - width) // 2
+            dy = (slot_height - height) // 2
+            slot[dy:dy + height, dx:dx + width] = frame
+        return self._canvas
+
+    def run(self):
+        """Обновляет окно по таймеру, пока пользователь не нажмет 'q' или ESC"""
+        next_tick = time.monotonic()
+        try:
+            while not self.stopped:
+                cv2.imshow(self.window_name, self.compose())
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q') or key == 27:  # 'q' или ESC
+                    break
+                next_tick += self.refresh_period
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Не успели - продолжаем от текущего момента без накопления отставания
+                    next_tick = time.monotonic()
+        finally:
+            self.stopped = True
+            self.attached = False
+            cv2.destroyWindow(self.window_name)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='mosaic', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
@@ -0,0 +1,326 @@
+"""
+Модуль отдельной стадии отрисовки результатов детекции.
+
+Отрисовка (масштабирование, bounding boxes, подписи, информационная панель,
+imshow/waitKey) вынесена из цикла инференса в отдельный поток. Цикл инференса
+только передает последний кадр с результатами в FrameRenderer.submit() и сразу
+продолжает работу, поэтому визуализация никогда не замедляет детекцию.
+
+Основные возможности:
+    - Отрисовка в отдельном потоке с ограничением частоты (DISPLAY_MAX_FPS)
+    - Хранится только последний кадр: если отрисовка не успевает, старые кадры отбрасываются
+    - Статические слои (контуры полок, фон и рамка панели) рисуются один раз для каждого
+      разрешения; контуры (SHELF_ALPHA) и фон панели (PANEL_ALPHA) накладываются
+      с альфа-смешиванием только в своих пикселях, без выделения памяти под весь кадр
+    - Кадры рисуются только когда подключено окно или приемник (sink)
+
+Классы:
+    FrameRenderer: Поток отрисовки для одной камеры
+
+Функции:
+    - resize_frame(): Масштабирование кадра с сохранением пропорций
+    - draw_results(): Отрисовка динамических элементов (объекты и текст панели)
+
+Приемники (sinks):
+    Любой объект с атрибутом attached (bool) и методом push(name, frame).
+    Необязательный метод register(name) вызывается при подключении приемника.
+    Например, мозаика нескольких камер или HTTP сервер предпросмотра.
+    Пока ни окно, ни приемник не подключены, submit() ничего не делает.
+    Если у приемника есть метод slot_size() -> (width, height), кадр сразу
+    масштабируется под этот размер (например, под ячейку мозаики; размер
+    запрашивается перед каждой отрисовкой), а если у
+    приемника есть атрибут stopped, его установка останавливает обработку потока.
+
+Использование:
+    from MVP.show_picture.renderer import FrameRenderer
+
+    renderer = FrameRenderer(name='camera-1', shelf_coordinates=shelves, show_window=True)
+    renderer.start()
+    for frame, results in area.process_camera_stream(camera=camera):
+        renderer.submit(frame, results)
+        if renderer.stopped:
+            break
+    renderer.stop()
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from MVP.config import MAX_DISPLAY_WIDTH, DISPLAY_MAX_FPS, PANEL_ALPHA, SHELF_ALPHA
+from MVP.metrics.metrics import get_metrics
+
+COLORS = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
+SHELF_COLOR = (0, 200, 255)
+PANEL_COLOR = (0, 0, 0)
+
+
+def resize_frame(frame, max_width=MAX_DISPLAY_WIDTH, max_height=None):
+    """
+    Масштабирует кадр, сохраняя пропорции, чтобы ширина не превышала max_width
+    (и высота не превышала max_height, если она задана).
+
+    Args:
+        frame: Входной кадр (numpy array)
+        max_width: Максимальная ширина для отображения
+        max_height: Максимальная высота для отображения (None - не ограничивается)
+
+    Returns:
+        Tuple: (масштабированный кадр, коэффициент масштабирования)
+    """
+    height, width = frame.shape[:2]
+
+    # Вычисляем коэффициент масштабирования
+    scale = max_width / width
+    if max_height is not None:
+        scale = min(scale, max_height / height)
+
+    if scale >= 1.0:
+        return frame, 1.0
+
+    new_width = int(width * scale)
+    new_height = int(height * scale)
+
+    # Масштабируем кадр
+    resized_frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return resized_frame, scale
+
+
+def _scaled(value, scale):
+    """Масштабирует размер элемента, только если кадр уменьшен"""
+    return value * scale if scale < 1.0 else value
+
+
+def _panel_rect(scale):
+    return 5, 5, int(_scaled(300, scale)), int(_scaled(85, scale))
+
+
+def draw_results(display_frame, results, scale):
+    """
+    Рисует bounding boxes объектов и текст информационной панели на уже
+    масштабированном кадре (in place).
+
+    Args:
+        display_frame: Масштабированный кадр
+        results: Словарь результатов AreaCalculator
+        scale: Коэффициент масштабирования кадра
+    """
+    box_thickness = max(1, int(2 * scale)) if scale < 1.0 else 2
+    font_scale = _scaled(0.6, scale)
+
+    for obj in results['objects_info']:
+        # Координаты объектов масштабируются тем же коэффициентом, что и кадр
+        x1, y1, x2, y2 = (int(value * scale) for value in obj['coordinates'])
+        color = COLORS[obj['class_id'] % len(COLORS)]
+        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, box_thickness)
+
+        label = f"{obj['class']} {obj['confidence']:.2f}"
+        (text_width, text_height), baseline = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, box_thickness
+        )
+        cv2.rectangle(display_frame, (x1, y1 - text_height - baseline - 5), (x1 + text_width, y1), color, -1)
+        cv2.putText(display_frame, label, (x1, y1 - baseline - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (255, 255, 255), box_thickness)
+
+    # Фон панели уже наложен статическим слоем, здесь только текст
+    info_font_scale = _scaled(1.0, scale)
+    text_y1 = int(_scaled(35, scale))
+    text_y2 = int(_scaled(75, scale))
+    cv2.putText(display_frame, f"Fill: {results['fill_percentage']:.1f}%", (10, text_y1),
+                cv2.FONT_HERSHEY_SIMPLEX, info_font_scale, (0, 255, 0), box_thickness)
+    cv2.putText(display_frame, f"Objects: {results['num_objects']}", (10, text_y2),
+                cv2.FONT_HERSHEY_SIMPLEX, info_font_scale, (0, 255, 0), box_thickness)
+
+
+class FrameRenderer:
+    def __init__(self, name: str = None, shelf_coordinates: list = None, show_window: bool = True,
+                 max_width: int = MAX_DISPLAY_WIDTH, max_fps: float = DISPLAY_MAX_FPS,
+                 panel_alpha: float = PANEL_ALPHA, window_name: str = 'Shelf Monitoring',
+                 max_height: int = None, shelf_alpha: float = SHELF_ALPHA):
+        self.name = name
+        self.shelf_coordinates = shelf_coordinates or []
+        self.show_window = show_window
+        self.max_width = max_width
+        self.max_height = max_height
+        self.min_period = 1.0 / max_fps if max_fps else 0.0
+        self.panel_alpha = panel_alpha
+        self.shelf_alpha = shelf_alpha
+        self.window_name = window_name
+        self.sinks = []
+
+        # Остановка по клавише 'q'/ESC в окне
+        self._stopped = False
+
+        self._latest = None
+        self._pending = False
+        self._new_frame = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Статические слои для текущего разрешения (см. _static_layer)
+        self._static_key = None
+        self._static = None
+
+    def attach(self, sink):
+        """Подключает приемник отрисованных кадров (мозаика, HTTP предпросмотр)"""
+        self.sinks.append(sink)
+        if hasattr(sink, 'register'):
+            sink.register(self.name)
+        self._update_size()
+
+    def _update_size(self):
+        """Без собственного окна кадр сразу масштабируется под текущий размер приемника"""
+        if self.show_window:
+            return
+        for sink in self.sinks:
+            if hasattr(sink, 'slot_size'):
+                self.max_width, self.max_height = sink.slot_size(self.name)
+
+    @property
+    def stopped(self) -> bool:
+        """True, если окно или приемник (например, мозаика) закрыты пользователем"""
+        return self._stopped or any(getattr(sink, 'stopped', False) for sink in self.sinks)
+
+    def detach(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    @property
+    def attached(self) -> bool:
+        """True, если есть окно или хотя бы один активный приемник"""
+        return self.show_window or any(sink.attached for sink in self.sinks)
+
+    def submit(self, frame, results):
+        """
+        Передает кадр на отрисовку. Не блокирует: сохраняется только последний кадр.
+        Кадр не копируется - read_frame() каждый раз возвращает новый массив.
+        """
+        # Ссылка на последний кадр хранится всегда, чтобы новый зритель сразу получил картинку,
+        # но рисуется он, только если есть окно или активный приемник
+        self._latest = (frame, results)
+        self._pending = True
+        if self.attached:
+            self._new_frame.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"render-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._new_frame.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _static_layer(self, shape, scale):
+        """
+        Рисует контуры полок и панель один раз для каждого разрешения. Возвращает словарь:
+            outline: (индексы пикселей контуров, их цвет * shelf_alpha)
+            border: (индексы пикселей рамки панели, их цвет)
+            panel: прямоугольник панели (x1, y1, x2, y2)
+            panel_bg: фон панели нужного размера, panel_buffer: буфер смешивания панели
+        """
+        key = (shape, scale)
+        if key != self._static_key:
+            thickness = max(1, int(2 * scale)) if scale < 1.0 else 2
+            outline = np.zeros(shape, dtype=np.uint8)
+            for x1, y1, x2, y2 in self.shelf_coordinates:
+                cv2.rectangle(outline, (int(x1 * scale), int(y1 * scale)), (int(x2 * scale), int(y2 * scale)),
+                              SHELF_COLOR, thickness)
+
+            px1, py1, px2, py2 = _panel_rect(scale)
+            border = np.zeros(shape, dtype=np.uint8)
+            cv2.rectangle(border, (px1, py1), (px2, py2), (0, 255, 0), thickness)
+
+            # Рамка панели рисуется поверх контуров без прозрачности
+            border_index = np.nonzero(border.any(axis=2))
+            outline[border_index] = 0
+            outline_index = np.nonzero(outline.any(axis=2))
+
+            panel_shape = (max(0, min(py2, shape[0]) - py1), max(0, min(px2, shape[1]) - px1), shape[2])
+            self._static_key = key
+            self._static = {
+                'outline': (outline_index, outline[outline_index].astype(np.float32) * self.shelf_alpha),
+                'border': (border_index, border[border_index]),
+                'panel': (px1, py1, px2, py2),
+                'panel_bg': np.full(panel_shape, PANEL_COLOR, dtype=np.uint8),
+                'panel_buffer': np.empty(panel_shape, dtype=np.uint8),
+            }
+        return self._static
+
+    def render(self, frame, results):
+        """Возвращает отрисованный кадр для отображения"""
+        # Сетка мозаики могла измениться после подключения
+        self._update_size()
+        display_frame, scale = resize_frame(frame, self.max_width, self.max_height)
+        if display_frame is frame:
+            display_frame = frame.copy()
+
+        static = self._static_layer(display_frame.shape, scale)
+        # Полупрозрачный фон панели: смешивается только область панели с заранее подготовленным фоном
+        px1, py1, px2, py2 = static['panel']
+        panel = display_frame[py1:py2, px1:px2]
+        if panel.size:
+            cv2.addWeighted(panel, 1.0 - self.panel_alpha, static['panel_bg'], self.panel_alpha, 0,
+                            dst=static['panel_buffer'])
+            panel[...] = static['panel_buffer']
+
+        # Контуры полок с альфа-смешиванием только в пикселях контуров
+        index, color = static['outline']
+        if color.size:
+            display_frame[index] = display_frame[index] * (1.0 - self.shelf_alpha) + color
+        index, color = static['border']
+        display_frame[index] = color
+
+        draw_results(display_frame, results, scale)
+        return display_frame
+
+    def _run(self):
+        last_render = 0.0
+        try:
+            while not self._stop_event.is_set():
+                # Окно должно обрабатывать события, даже если новых кадров нет,
+                # а приемник может подключиться к уже полученному кадру
+                self._new_frame.wait(timeout=0.05 if self.show_window else 0.5)
+                if self._stop_event.is_set():
+                    break
+
+                if self._pending and self.attached:
+                    # Ограничение частоты отрисовки
+                    wait = last_render + self.min_period - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    self._new_frame.clear()
+                    self._pending = False
+                    frame, results = self._latest
+                    last_render = time.monotonic()
+                    try:
+                        with get_metrics().timer('render', self.name):
+                            display_frame = self.render(frame, results)
+                        if self.show_window:
+                            cv2.imshow(self.window_name, display_frame)
+                        for sink in self.sinks:
+                            if sink.attached:
+                                sink.push(self.name, display_frame)
+                    except Exception as e:
+                        print(f"Ошибка отрисовки кадра {self.name}: {e}")
+
+                if self.show_window:
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == ord('q') or key == 27:  # 'q' или ESC
+                        self._stopped = True
+                        break
+        finally:
+            if self.show_window:
+                # Окно создано и обслуживается этим потоком - здесь же и закрывается
+                try:
+                    cv2.destroyWindow(self.window_name)
+                    cv2.waitKey(1)
+                except cv2.error:
+                    # Окно не было создано: ни одного кадра не отрисовано
+                    pass
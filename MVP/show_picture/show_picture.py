@@ -22,6 +22,24 @@
     - run_periodic(): Запускает периодический мониторинг с заданным интервалом
     - start_in_store(): Запускает периодический мониторинг с отправкой данных на API
 
+Отрисовка:
+    start() передает кадры в FrameRenderer (MVP/show_picture/renderer.py), который
+    рисует и показывает их в отдельном потоке с ограничением частоты. Цикл детекции
+    не ждет отрисовку и не блокируется на waitKey().
+
+Сглаживание:
+    Процент наполнения камеры и каждой полки сглаживается по времени
+    (MVP/area_calculation/smoothing.py, SMOOTHING_METHOD в config.py) до
+    отображения и до решения политики отправки.
+
+Расписание магазина:
+    run_periodic() и start_in_store() учитывают расписание магазина (MVP/schedule).
+    Вне часов работы камера отключается и инференс не выполняется, после
+    возобновления первые кадры и первый результат модели отбрасываются (прогрев).
+    Измерения выполняются на фиксированных тиках (MVP/schedule/tick_scheduler.py):
+    период не зависит от длительности инференса и отправки, а камеры процесса
+    равномерно разнесены по интервалу.
+
 Использование:
     from MVP.show_picture.show_picture import ShowPicture
     from MVP.camera.camera import Camera
@@ -44,42 +62,24 @@
 Дата: 2026-01-27
 """
 
-import cv2
 import time
-import io
-import requests
 from ultralytics import YOLO
 
 from MVP.area_calculation.area_calculation import AreaCalculator
+from MVP.area_calculation.smoothing import FillSmoother
 from MVP.area_calculation.calculations import load_shelf_coordinates_from_json
 from MVP.camera.camera import Camera
-from MVP.config import SKIP_FRAMES, MAX_DISPLAY_WIDTH, API_BASE_URL
-
-
-def resize_frame(frame, max_width=MAX_DISPLAY_WIDTH):
-    """
-    Масштабирует кадр, сохраняя пропорции, чтобы ширина не превышала max_width.
-
-    Args:
-        frame: Входной кадр (numpy array)
-        max_width: Максимальная ширина для отображения
-
-    Returns:
-        Tuple: (масштабированный кадр, коэффициент масштабирования)
-    """
-    height, width = frame.shape[:2]
-
-    if width <= max_width:
-        return frame, 1.0
-
-    # Вычисляем коэффициент масштабирования
-    scale = max_width / width
-    new_width = int(width * scale)
-    new_height = int(height * scale)
-
-    # Масштабируем кадр
-    resized_frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-    return resized_frame, scale
+from MVP.config import SKIP_FRAMES, API_BASE_URL, ADAPTIVE_SKIP_FRAMES, ID_STORE, WARMUP_FRAMES, \
+    QUALITY_GATE_ENABLED
+from MVP.governor.governor import FrameGovernor
+from MVP.quality.quality_gate import FrameQualityGate
+from MVP.schedule.store_schedule import StoreSchedule, load_store_schedule, SUSPENDED
+from MVP.schedule.tick_scheduler import get_tick_scheduler
+from MVP.show_picture.renderer import FrameRenderer
+from MVP.upload.batch import BatchAggregator
+from MVP.upload.encoder import FrameEncoder
+from MVP.upload.report_policy import ReportPolicy
+from MVP.upload.uploader import UploadQueue
 
 
 def on_frame_processed(frame, results):
@@ -93,102 +93,64 @@ class ShowPicture:
         self.area = AreaCalculator(model)
         self.last_output_time = 0
         self.output_interval = 300  # 5 минут в секундах
-    def start(self, camera:Camera, json_path:str, video:bool = True):
+        # Проверки качества кадров по IP камеры (у каждой камеры свой эталонный кадр)
+        self.quality_gates = {}
+        # Сглаживание наполнения по камерам и полкам; результат идет и в отчеты, и на экран
+        self.smoother = FillSmoother()
+
+    def quality_gate(self, camera:Camera):
+        """Возвращает проверку качества кадров для камеры или None, если проверка отключена"""
+        if not QUALITY_GATE_ENABLED:
+            return None
+        if camera.ip_camera not in self.quality_gates:
+            self.quality_gates[camera.ip_camera] = FrameQualityGate(name=camera.ip_camera)
+        return self.quality_gates[camera.ip_camera]
+    def start(self, camera:Camera, json_path:str, video:bool = True, sinks:list = None):
+        """
+        Запускает непрерывную обработку видеопотока с отображением.
+
+        Args:
+            camera: Экземпляр класса Camera
+            json_path: Путь к JSON файлу с координатами полок
+            video: Показывать ли окно OpenCV
+            sinks: Дополнительные приемники отрисованных кадров (см. MVP/show_picture/renderer.py)
+        """
 
+        # Шаг пропуска кадров подбирается автоматически, если включен регулятор
+        governor = FrameGovernor(name=camera.ip_camera) if ADAPTIVE_SKIP_FRAMES else None
+        renderer = None
         try:
             shelf_coordinates = load_shelf_coordinates_from_json(json_path)
+            renderer = FrameRenderer(name=camera.ip_camera, shelf_coordinates=shelf_coordinates,
+                                     show_window=video)
+            for sink in sinks or []:
+                renderer.attach(sink)
+            renderer.start()
             for frame, results in self.area.process_camera_stream(
                 camera=camera,
                 shelf_coordinates=shelf_coordinates,
                 filter_objects_in_shelves=True,
                 callback=on_frame_processed,
-                skip_frames=SKIP_FRAMES
+                skip_frames=SKIP_FRAMES,
+                governor=governor,
+                quality_gate=self.quality_gate(camera)
             ):
-                if video:
-                    # Сначала масштабируем кадр для отображения
-                    display_frame, scale = resize_frame(frame.copy(), MAX_DISPLAY_WIDTH)
-
-                    # Рисуем bounding boxes для всех обнаруженных объектов
-                    # Координаты объектов масштабируются тем же коэффициентом, что и кадр
-                    colors = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
-                    for obj in results['objects_info']:
-                        x1, y1, x2, y2 = obj['coordinates']
-                        # Масштабируем координаты под масштабированный кадр
-                        x1, y1, x2, y2 = int(x1 * scale), int(y1 * scale), int(x2 * scale), int(y2 * scale)
-
-                        # Выбираем цвет в зависимости от класса
-                        color = colors[obj['class_id'] % len(colors)]
-
-                        # Рисуем прямоугольник (bounding box) с масштабированной толщиной
-                        box_thickness = max(1, int(2 * scale)) if scale < 1.0 else 2
-                        cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, box_thickness)
-
-                        # Формируем текст с классом и уверенностью
-                        label = f"{obj['class']} {obj['confidence']:.2f}"
-
-                        # Вычисляем размер текста для фона (масштабируем размер шрифта)
-                        font_scale = 0.6 * scale if scale < 1.0 else 0.6
-                        thickness = max(1, int(2 * scale)) if scale < 1.0 else 2
-                        (text_width, text_height), baseline = cv2.getTextSize(
-                            label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
-                        )
-
-                        # Рисуем фон для текста
-                        cv2.rectangle(
-                            display_frame,
-                            (x1, y1 - text_height - baseline - 5),
-                            (x1 + text_width, y1),
-                            color,
-                            -1
-                        )
-
-                        # Рисуем текст
-                        cv2.putText(
-                            display_frame,
-                            label,
-                            (x1, y1 - baseline - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            font_scale,
-                            (255, 255, 255),
-                            thickness
-                        )
-
-                    # Добавляем текст с информацией о проценте наполнения
-                    fill_text = f"Fill: {results['fill_percentage']:.1f}%"
-                    objects_text = f"Objects: {results['num_objects']}"
-
-                    # Масштабируем размеры информационной панели
-                    info_font_scale = 1.0 * scale if scale < 1.0 else 1.0
-                    info_thickness = max(1, int(2 * scale)) if scale < 1.0 else 2
-                    info_panel_x2 = int(300 * scale) if scale < 1.0 else 300
-                    info_panel_y2 = int(85 * scale) if scale < 1.0 else 85
-
-                    # Рисуем фон для информационного текста
-                    cv2.rectangle(display_frame, (5, 5), (info_panel_x2, info_panel_y2), (0, 0, 0), -1)
-                    cv2.rectangle(display_frame, (5, 5), (info_panel_x2, info_panel_y2), (0, 255, 0), info_thickness)
-
-                    # Рисуем текст на кадре
-                    text_y1 = int(35 * scale) if scale < 1.0 else 35
-                    text_y2 = int(75 * scale) if scale < 1.0 else 75
-                    cv2.putText(display_frame, fill_text, (10, text_y1),
-                                cv2.FONT_HERSHEY_SIMPLEX, info_font_scale, (0, 255, 0), info_thickness)
-                    cv2.putText(display_frame, objects_text, (10, text_y2),
-                                cv2.FONT_HERSHEY_SIMPLEX, info_font_scale, (0, 255, 0), info_thickness)
-
-                    # Отображаем кадр (уже масштабированный)
-                    cv2.imshow('Shelf Monitoring', display_frame)
-
-                    # Выход по нажатию 'q' или ESC
-                    key = cv2.waitKey(1) & 0xFF
-                    if key == ord('q') or key == 27:  # 'q' или ESC
-                        break
+                results = self.smoother.update(camera.ip_camera, results)
+
+                # Отрисовка выполняется в отдельном потоке и не задерживает детекцию
+                renderer.submit(frame, results)
+                if renderer.stopped:
+                    break
 
         except KeyboardInterrupt:
             print("Остановка обработки потока...")
 
         finally:
+            if renderer is not None:
+                renderer.stop()
+            if governor is not None:
+                governor.release()
             camera.release()
-            cv2.destroyAllWindows()
 
 
     def frame(self, camera:Camera, shelf_coordinates):
@@ -196,25 +158,70 @@ class ShowPicture:
         Получает один кадр с камеры, обрабатывает его и выводит результаты раз в 5 минут.
         
         Returns:
-            Tuple (frame, results_dict) или None, если еще не прошло 5 минут с последнего вывода
+            Tuple (frame, results_dict) или None, если еще не прошло 5 минут с последнего вывода.
+            results_dict равен None, если кадр отбракован проверкой качества
         """
 
         # Получаем один кадр и обрабатываем его
         frame, results = self.area.frame_camera(
             camera=camera,
             shelf_coordinates=shelf_coordinates,
-            filter_objects_in_shelves=True
+            filter_objects_in_shelves=True,
+            quality_gate=self.quality_gate(camera)
         )
+        results = self.smoother.update(camera.ip_camera, results)
 
 
         return frame, results
-    
-    def run_periodic(self, camera:Camera, shelf_coordinates):
+
+    def wait_for_schedule(self, camera:Camera, shelf_coordinates, schedule:StoreSchedule):
+        """
+        Блокирует выполнение, пока по расписанию мониторинг приостановлен.
+
+        На время приостановки соединение с камерой закрывается (read_frame
+        переподключится автоматически). После возобновления выполняется прогрев:
+        несколько кадров пропускаются, а первый результат модели отбрасывается,
+        чтобы в отчеты не попал кадр с неустановившейся экспозицией.
+
+        Returns:
+            True, если мониторинг был приостановлен и камера прогрета заново
+        """
+        if schedule.state() != SUSPENDED:
+            return False
+
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Магазин закрыт по расписанию, "
+              f"камера {camera.ip_camera} приостановлена")
+        camera.release()
+        while schedule.state() == SUSPENDED:
+            time.sleep(schedule.seconds_until_change())
+
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Возобновление мониторинга, "
+              f"прогрев камеры {camera.ip_camera}")
+        # Значения до паузы не должны влиять на утренние измерения
+        self.smoother.reset(camera.ip_camera)
+        frame = None
+        for _ in range(WARMUP_FRAMES):
+            frame = camera.read_frame()
+        if frame is not None:
+            self.area.calculate_shelf_fill_percentage(
+                image=frame,
+                shelf_coordinates=shelf_coordinates,
+                filter_objects_in_shelves=True
+            )
+        return True
+
+    def run_periodic(self, camera:Camera, shelf_coordinates, schedule:StoreSchedule = None):
     
         """
         Запускает цикл, который получает данные с камеры и выводит их раз в 5 минут.
         Камера подключается один раз при инициализации класса.
+
+        Args:
+            schedule: Расписание магазина. По умолчанию загружается для ID_STORE из config
         """
+        if schedule is None:
+            schedule = load_store_schedule(id_store=ID_STORE, ip_camera=camera.ip_camera)
+
         print("Запуск периодического мониторинга...")
         print(f"Данные будут получаться и выводиться каждые {self.output_interval // 60} минут")
         print("Для остановки нажмите Ctrl+C\n")
@@ -222,25 +229,28 @@ class ShowPicture:
         # Первый вывод сразу
         self.last_output_time = 0
 
+        # Измерения выполняются на фиксированных тиках, камеры процесса разнесены по интервалу
+        ticker = get_tick_scheduler()
+        ticker.register(camera.ip_camera)
         try:
             while True:
-                # Получаем данные с камеры и выводим, если прошло 5 минут
-                result = self.frame(camera=camera, shelf_coordinates=shelf_coordinates)
-                
-                if result is None:
-                    # Еще не прошло 5 минут, ждем перед следующей проверкой
-                    time.sleep(10)  # Проверяем каждые 10 секунд
-                else:
-                    # Данные были выведены, ждем 5 минут перед следующим получением
-                    time.sleep(self.output_interval)
+                if self.wait_for_schedule(camera, shelf_coordinates, schedule):
+                    ticker.reset(camera.ip_camera)
+                ticker.wait(camera.ip_camera, schedule.interval(self.output_interval))
+
+                # Получаем данные с камеры и выводим их
+                self.frame(camera=camera, shelf_coordinates=shelf_coordinates)
                 
         except KeyboardInterrupt:
             print("\nОстановка мониторинга...")
         finally:
+            ticker.unregister(camera.ip_camera)
             camera.release()
             print("Камера отключена")
     def start_in_store(self, camera:Camera, shelf_coordinates:list, id_store:int, 
-                       time_interval:int = 60, api_url:str = None):
+                       time_interval:int = 60, api_url:str = None, schedule:StoreSchedule = None,
+                       sinks:list = None, uploader:UploadQueue = None, batch:BatchAggregator = None,
+                       report_policy:ReportPolicy = None, encoder:FrameEncoder = None):
         """
         Запускает периодический мониторинг полок с отправкой данных на API.
         
@@ -250,81 +260,134 @@ class ShowPicture:
             id_store: ID магазина для отправки на API
             time_interval: Интервал между отправками данных в секундах (по умолчанию 60)
             api_url: URL API эндпоинта (по умолчанию используется API_BASE_URL из config)
+            schedule: Расписание магазина. По умолчанию загружается по id_store и IP камеры
+                      из STORE_SCHEDULE_PATH
+            sinks: Приемники отрисованных кадров, например PreviewServer для удаленного
+                   просмотра на машинах без монитора. Кадры рисуются, только пока есть зрители
+            uploader: Очередь фоновой отправки. Одну очередь можно передать нескольким камерам
+                      процесса; по умолчанию создается своя очередь для api_url
+            batch: Сборщик пакетов (BatchAggregator), общий для всех камер процесса. Если задан,
+                   результаты с наполнением каждой полки отправляются пакетами
+            report_policy: Политика отправки (ReportPolicy): отправляются только значимые изменения
+                           и контрольные отчеты, изображение прикладывается по правилу политики
+            encoder: Кодировщик изображений (FrameEncoder). Кадр уменьшается, кодируется в фоновом
+                     потоке и передается в очередь отправки после кодирования
         
         Отправляет на API:
             - id_store: ID магазина
             - void: Процент наполнения (int, округленный)
             - ip_camera: IP адрес камеры
-            - file: Изображение кадра в формате JPEG
+            - create_at: Время измерения (результаты из spool досылаются с задержкой)
+            - file: Изображение кадра в формате JPEG (только если его требует политика отправки)
         """
         if api_url is None:
             api_url = f"{API_BASE_URL}/entrance/photo"
+        if schedule is None:
+            schedule = load_store_schedule(id_store=id_store, ip_camera=camera.ip_camera)
         
         print(f"Запуск мониторинга для магазина ID: {id_store}")
         print(f"Интервал отправки данных: {time_interval} секунд")
         print(f"API URL: {api_url}")
         print("Для остановки нажмите Ctrl+C\n")
         
+        interval = time_interval
+        if report_policy is None:
+            report_policy = ReportPolicy()
+        own_uploader = uploader is None and batch is None
+        if own_uploader:
+            uploader = UploadQueue(api_url=api_url).start()
+        own_encoder = encoder is None
+        if own_encoder:
+            encoder = FrameEncoder()
+        renderer = None
+        if sinks:
+            renderer = FrameRenderer(name=camera.ip_camera, shelf_coordinates=shelf_coordinates,
+                                     show_window=False)
+            for sink in sinks:
+                renderer.attach(sink)
+            renderer.start()
+        # Измерения выполняются на фиксированных тиках, камеры процесса разнесены по интервалу
+        ticker = get_tick_scheduler()
+        ticker.register(camera.ip_camera)
         try:
             while True:
                 try:
+                    # Вне часов работы магазина ждем без захвата кадров и инференса
+                    if self.wait_for_schedule(camera, shelf_coordinates, schedule):
+                        ticker.reset(camera.ip_camera)
+                    interval = schedule.interval(time_interval)
+                    tick = ticker.wait(camera.ip_camera, interval)
+
                     # Получаем кадр и результаты анализа
                     frame, results = self.frame(camera=camera, shelf_coordinates=shelf_coordinates)
                     
-                    if frame is None or results is None:
+                    if frame is None:
                         print("Не удалось получить кадр, пропускаем итерацию...")
-                        time.sleep(time_interval)
+                        continue
+
+                    if results is None:
+                        # Кадр отбракован до инференса, в отчет он не попадает
+                        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Кадр отбракован. "
+                              f"{self.quality_gate(camera).summary()}")
                         continue
                     
+                    if renderer is not None:
+                        renderer.submit(frame, results)
+
                     ip_camera = camera.ip_camera
                     fill_percentage = results['fill_percentage']
                     void_percentage = int(round(fill_percentage))  # Округляем до целого числа
                     
-                    # Конвертируем кадр в JPEG формат для отправки
-                    # Используем cv2.imencode для кодирования изображения в память
-                    success, buffer = cv2.imencode('.jpg', frame)
-                    
-                    if not success:
-                        print("Ошибка кодирования изображения, пропускаем отправку...")
-                        time.sleep(time_interval)
+                    create_at = time.strftime('%Y-%m-%d %H:%M:%S')
+                    shelves = [int(round(value)) for value in results['shelves_fill']]
+
+                    # Отправляются только значимые изменения и контрольные отчеты (heartbeat)
+                    # Интервалы между отчетами считаются по тикам, а не по окончанию инференса
+                    report, attach_image = report_policy.decide(ip_camera, void_percentage, shelves, now=tick)
+                    if not report:
                         continue
-                    
-                    # Создаем BytesIO объект из буфера
-                    image_bytes = io.BytesIO(buffer.tobytes())
-                    
-                    # Подготавливаем данные для отправки
-                    files = {
-                        'file': ('image.jpg', image_bytes, 'image/jpeg')
-                    }
-                    data = {
-                        'id_store': id_store,
-                        'void': void_percentage,
-                        'ip_camera': ip_camera
-                    }
-                    
-                    # Отправляем POST запрос на API
-                    try:
-                        response = requests.post(api_url, files=files, data=data, timeout=10)
-                        
-                        if response.status_code == 200:
-                            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Данные успешно отправлены: "
-                                  f"ID магазина={id_store}, Наполнение={void_percentage}%, IP={ip_camera}")
-                        else:
-                            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка отправки данных: "
-                                  f"HTTP {response.status_code} - {response.text}. response: {response}")
-                    
-                    except requests.exceptions.RequestException as e:
-                        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка подключения к API: {e}")
-                    
-                    # Ждем перед следующей отправкой
-                    time.sleep(time_interval)
+
+                    if batch is not None:
+                        # Результаты всех камер процесса уходят одним пакетом
+                        record = {
+                            'id_store': id_store,
+                            'ip_camera': ip_camera,
+                            'create_at': create_at,
+                            'void': void_percentage,
+                            'shelves': shelves
+                        }
+                        deliver = lambda image, record=record: batch.add(record, image)
+                    else:
+                        data = {
+                            'id_store': id_store,
+                            'void': void_percentage,
+                            'ip_camera': ip_camera,
+                            # Время измерения: результат может быть дослан из spool позже
+                            'create_at': create_at
+                        }
+                        # Отправка выполняется в фоновом потоке и не сдвигает расписание измерений
+                        deliver = lambda image, data=data: uploader.submit(data, image)
+
+                    if attach_image:
+                        # Кадр уменьшается и кодируется в JPEG в фоновом потоке,
+                        # результат передается на отправку после кодирования
+                        encoder.encode_async(frame, shelf_coordinates, deliver, name=ip_camera)
+                    else:
+                        deliver(None)
                     
                 except KeyboardInterrupt:
                     print("\nОстановка мониторинга...")
                     break
                 except Exception as e:
                     print(f"Ошибка в цикле мониторинга: {e}")
-                    time.sleep(time_interval)  # Ждем перед следующей попыткой
         finally:
+            ticker.unregister(camera.ip_camera)
+            if renderer is not None:
+                renderer.stop()
+            # Сначала дожидаемся кодирования, чтобы последние изображения попали в очередь
+            if own_encoder:
+                encoder.close()
+            if own_uploader:
+                uploader.stop()
             camera.release()
             print("Камера отключена")
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Модуль супервизора для запуска всех камер магазина на одной машине.
+
+Раньше MVP/main.py и test.py запускали одну камеру с жестко заданными IP и
+файлом калибровки. Супервизор читает список камер магазина (fleet config),
+распределяет камеры по рабочим процессам с учетом нагрузки и закрепляет за
+каждым процессом свои ядра CPU. Внутри процесса одна модель YOLO обслуживает
+все его камеры (каждая камера работает в своем потоке через start_in_store).
+
+Основные возможности:
+    - Конфигурация камер в JSON: IP, файл калибровки, ID магазина, расписание, интервал
+    - Распределение камер по процессам по нагрузке (частоте измерений)
+    - Закрепление процессов за ядрами CPU (Linux) и ограничение потоков torch
+    - Одна модель и одна очередь отправки на процесс, у каждого процесса свой файл spool
+    - Перезапуск упавших процессов и потоков камер с экспоненциальной задержкой
+    - Перераспределение камер при изменении файла конфигурации
+
+Формат JSON файла (FLEET_CONFIG_PATH в config.py):
+    {
+        "model": "my_best-shelf-void-model.pt",
+        "workers": 2,
+        "batch": false,
+        "defaults": {"id_store": 42013, "time_interval": 60, "schedule": "store_schedule.json"},
+        "cameras": [
+            {"ip_camera": "10.142.13.204", "calibration": "shelves_204.json"},
+            {"ip_camera": "10.142.13.195", "calibration": "shelves_195.json", "time_interval": 120}
+        ]
+    }
+
+    Необязательные поля: model (по умолчанию YOLO_MODEL), workers (по умолчанию
+    SUPERVISOR_WORKERS), batch (пакетная отправка через BatchAggregator).
+    Настройки камеры перекрывают defaults.
+
+Классы:
+    Supervisor: Запуск и контроль рабочих процессов
+
+Функции:
+    - load_fleet(): Загружает конфигурацию камер
+    - plan_workers(): Распределяет камеры по процессам
+    - run_worker(): Точка входа рабочего процесса
+
+Использование:
+    python -m MVP.main [fleet.json]
+
+    from MVP.supervisor.supervisor import Supervisor
+    Supervisor('fleet.json').run()
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from typing import List
+
+from MVP.config import YOLO_MODEL, ID_STORE, STORE_SCHEDULE_PATH, API_BASE_URL, FLEET_CONFIG_PATH, \
+    SUPERVISOR_WORKERS, SUPERVISOR_CORES_PER_WORKER, SUPERVISOR_RESTART_BACKOFF, SUPERVISOR_MAX_BACKOFF, \
+    SUPERVISOR_STABLE_TIME, METRICS_PORT, SPOOL_ENABLED
+from MVP.upload.spool import merge_orphan_spools
+
+
+def load_fleet(path: str = FLEET_CONFIG_PATH) -> dict:
+    """
+    Загружает конфигурацию камер магазина.
+
+    Returns:
+        Словарь {'model', 'workers', 'batch', 'cameras': [...]}, у каждой камеры
+        заполнены ip_camera, calibration, id_store, time_interval и schedule
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    defaults = {'id_store': ID_STORE, 'time_interval': 60, 'schedule': STORE_SCHEDULE_PATH}
+    defaults.update(data.get('defaults', {}))
+    cameras = []
+    for camera in data.get('cameras', []):
+        config = dict(defaults, **camera)
+        if not config.get('ip_camera') or not config.get('calibration'):
+            raise ValueError(f"У камеры должны быть заданы ip_camera и calibration: {camera}")
+        interval = config.get('time_interval')
+        if isinstance(interval, bool) or not isinstance(interval, (int, float)) or not interval > 0:
+            raise ValueError(f"time_interval камеры должен быть положительным числом: {camera}")
+        cameras.append(config)
+
+    return {
+        'model': data.get('model', YOLO_MODEL),
+        'workers': data.get('workers', SUPERVISOR_WORKERS),
+        'batch': data.get('batch', False),
+        'cameras': cameras,
+    }
+
+
+def _available_cores() -> List[int]:
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_workers(cameras: list, workers: int = None) -> List[dict]:
+    """
+    Распределяет камеры по рабочим процессам.
+
+    Нагрузка камеры - количество измерений в секунду (1 / time_interval).
+    Камеры назначаются по убыванию нагрузки в наименее загруженный процесс,
+    ядра CPU делятся между процессами поровну.
+
+    Returns:
+        Список [{'cameras': [...], 'cores': [...]}, ...]
+    """
+    cores = _available_cores()
+    if workers is None:
+        workers = max(1, len(cores) // SUPERVISOR_CORES_PER_WORKER)
+    workers = max(1, min(workers, len(cameras)))
+
+    plan = [{'cameras': [], 'cores': [], 'load': 0.0} for _ in range(workers)]
+    for camera in sorted(cameras, key=lambda camera: -1.0 / camera['time_interval']):
+        target = min(plan, key=lambda worker: worker['load'])
+        target['cameras'].append(camera)
+        target['load'] += 1.0 / camera['time_interval']
+
+    chunk = len(cores) // workers
+    for index, worker in enumerate(plan):
+        if chunk:
+            worker['cores'] = cores[index * chunk:(index + 1) * chunk]
+        else:
+            # Процессов больше, чем ядер - ядра используются совместно
+            worker['cores'] = [cores[index % len(cores)]]
+    return plan
+
+
+def _run_camera(show, config: dict, uploader, batch, stop_event):
+    """Поток камеры: start_in_store с перезапуском и экспоненциальной задержкой"""
+    from MVP.area_calculation.calculations import load_shelf_coordinates_from_json
+    from MVP.camera.camera import Camera
+    from MVP.schedule.store_schedule import load_store_schedule
+
+    delay = SUPERVISOR_RESTART_BACKOFF
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            camera = Camera(ip_camera=config['ip_camera'])
+            show.start_in_store(
+                camera=camera,
+                shelf_coordinates=load_shelf_coordinates_from_json(config['calibration']),
+                id_store=config['id_store'],
+                time_interval=config['time_interval'],
+                schedule=load_store_schedule(id_store=config['id_store'], ip_camera=config['ip_camera'],
+                                             path=config['schedule']),
+                uploader=uploader,
+                batch=batch,
+            )
+        except Exception as e:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Камера {config['ip_camera']} остановлена с ошибкой: {e}")
+
+        if time.monotonic() - started >= SUPERVISOR_STABLE_TIME:
+            delay = SUPERVISOR_RESTART_BACKOFF
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Перезапуск камеры {config['ip_camera']} через {delay} с")
+        if stop_event.wait(delay):
+            break
+        delay = min(delay * 2, SUPERVISOR_MAX_BACKOFF)
+
+
+def run_worker(index: int, cameras: list, cores: list, model_path: str, use_batch: bool, stop_event):
+    """
+    Точка входа рабочего процесса: одна модель, одна очередь отправки и поток на каждую камеру.
+    """
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+        torch.set_num_threads(max(1, len(cores)))
+    except ImportError:
+        pass
+
+    from ultralytics import YOLO
+    from MVP.governor.governor import FrameGovernor
+    from MVP.metrics.metrics import get_metrics
+    from MVP.show_picture.show_picture import ShowPicture
+    from MVP.upload.batch import BatchAggregator
+    from MVP.upload.spool import get_spool, worker_spool_path
+    from MVP.upload.uploader import UploadQueue
+
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Процесс {index}: камеры "
+          f"{', '.join(camera['ip_camera'] for camera in cameras)}, ядра {cores}")
+    # Бюджет CPU камер процесса считается от его ядер, а не от всей машины
+    FrameGovernor.set_process_cores(len(cores) or os.cpu_count() or 1)
+    # Время этапов по камерам процесса: эндпоинт на своем порту и сводка в консоли
+    get_metrics().serve(port=METRICS_PORT + index).start_reporter()
+    show = ShowPicture(model=YOLO(model_path))
+    if SPOOL_ENABLED:
+        # Свой файл spool до создания очередей: процессы с общим файлом досылали бы одни и те же записи
+        get_spool(worker_spool_path(index))
+    uploader = UploadQueue(api_url=f"{API_BASE_URL}/entrance/photo").start()
+    batch = BatchAggregator().start() if use_batch else None
+
+    for camera in cameras:
+        thread = threading.Thread(target=_run_camera, args=(show, camera, uploader, batch, stop_event),
+                                  name=f"camera-{camera['ip_camera']}", daemon=True)
+        thread.start()
+
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Потоки камер завершатся вместе с процессом, неотправленное уходит в spool
+        if batch is not None:
+            batch.stop()
+        uploader.stop()
+
+
+class Supervisor:
+    def __init__(self, fleet_path: str = FLEET_CONFIG_PATH):
+        """
+        Args:
+            fleet_path: Путь к JSON файлу с камерами магазина
+        """
+        self.fleet_path = fleet_path
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._stop_event = None
+        self._fleet_mtime = None
+
+    def _start_workers(self, fleet: dict):
+        if not fleet['cameras']:
+            print(f"В {self.fleet_path} не задано ни одной камеры")
+        self._stop_event = self._context.Event()
+        self._workers = [
+            {
+                'index': index,
+                'cameras': worker['cameras'],
+                'cores': worker['cores'],
+                'model': fleet['model'],
+                'batch': fleet['batch'],
+                'process': None,
+                'started': 0.0,
+                'delay': SUPERVISOR_RESTART_BACKOFF,
+                'restart_at': 0.0,
+            }
+            for index, worker in enumerate(plan_workers(fleet['cameras'], fleet['workers']))
+            if worker['cameras']
+        ]
+        if SPOOL_ENABLED:
+            # Процессы остановлены: записи файлов spool, индексов которых больше нет, переходят
+            # работающему процессу, иначе они никогда не будут отправлены
+            merge_orphan_spools([worker['index'] for worker in self._workers])
+        for worker in self._workers:
+            self._spawn(worker)
+
+    def _spawn(self, worker: dict):
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker['index'], worker['cameras'], worker['cores'], worker['model'], worker['batch'],
+                  self._stop_event),
+            name=f"shelf-worker-{worker['index']}",
+        )
+        process.start()
+        worker['process'] = process
+        worker['started'] = time.monotonic()
+        worker['restart_at'] = None
+
+    def _stop_workers(self, timeout: float = 15):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            process = worker['process']
+            if process is None:
+                continue
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._workers = []
+
+    def _check_workers(self):
+        """Перезапускает упавшие процессы с экспоненциальной задержкой"""
+        now = time.monotonic()
+        for worker in self._workers:
+            process = worker['process']
+            if worker['restart_at'] is None:
+                if process.is_alive():
+                    continue
+                if now - worker['started'] >= SUPERVISOR_STABLE_TIME:
+                    worker['delay'] = SUPERVISOR_RESTART_BACKOFF
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Процесс {worker['index']} завершился "
+                      f"(код {process.exitcode}), перезапуск через {worker['delay']} с")
+                worker['restart_at'] = now + worker['delay']
+                worker['delay'] = min(worker['delay'] * 2, SUPERVISOR_MAX_BACKOFF)
+            elif now >= worker['restart_at']:
+                self._spawn(worker)
+
+    def _load_fleet(self):
+        """Загружает конфигурацию камер. Возвращает None, если файл не изменился или содержит ошибку"""
+        try:
+            mtime = os.path.getmtime(self.fleet_path)
+            if mtime == self._fleet_mtime:
+                return None
+            self._fleet_mtime = mtime
+            return load_fleet(self.fleet_path)
+        except (OSError, ValueError) as e:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка загрузки {self.fleet_path}: {e}")
+            return None
+
+    def run(self, check_interval: float = 1.0):
+        """Запускает рабочие процессы и следит за ними до Ctrl+C"""
+        print(f"Запуск супервизора, конфигурация камер: {self.fleet_path}")
+        print("Для остановки нажмите Ctrl+C\n")
+        self._start_workers(load_fleet(self.fleet_path))
+        self._fleet_mtime = os.path.getmtime(self.fleet_path)
+        try:
+            while True:
+                time.sleep(check_interval)
+                fleet = self._load_fleet()
+                if fleet is not None:
+                    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Конфигурация камер изменилась, "
+                          f"перераспределение камер по процессам")
+                    self._stop_workers()
+                    self._start_workers(fleet)
+                    continue
+                self._check_workers()
+        except KeyboardInterrupt:
+            print("\nОстановка супервизора...")
+        finally:
+            self._stop_workers()
+            print("Все процессы остановлены")
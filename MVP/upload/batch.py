@@ -0,0 +1,133 @@
+"""
+Модуль пакетной отправки результатов нескольких камер.
+
+Раньше каждая камера в start_in_store отправляла отдельный multipart POST с
+JPEG на каждый интервал: магазин с 40 камерами делал 40 запросов в минуту к
+API и таблице store_entrances. BatchAggregator собирает результаты всех камер
+процесса за окно BATCH_WINDOW и отправляет их одним запросом на
+/entrance/batch. Накладные расходы на запрос делятся на все камеры как на
+стороне магазина, так и на стороне API.
+
+Формат запроса (multipart/form-data):
+    - поле records: количество записей в пакете
+    - файл payload (payload.json.gz): JSON список записей, сжатый gzip
+    - файлы image_<n> (image/jpeg): изображения, только для записей, где их требует политика
+
+Формат записи:
+    {
+        "id_store": 42013,
+        "ip_camera": "10.142.13.204",
+        "create_at": "2026-01-27 16:53:00",
+        "void": 37,                  # процент наполнения камеры (целое)
+        "shelves": [40, 12, 75],     # процент наполнения каждой полки (целые)
+        "image": "image_0"           # имя файла изображения (только если оно приложено)
+    }
+
+Классы:
+    BatchAggregator: Сборщик результатов камер процесса в пакеты
+
+Методы BatchAggregator:
+    - add(record, image): Добавляет результат камеры (потокобезопасно)
+    - flush(): Передает накопленный пакет в очередь отправки
+    - start() / stop(): Запуск и остановка периодической отправки
+
+Использование:
+    from MVP.upload.batch import BatchAggregator
+
+    batch = BatchAggregator().start()
+    # Один сборщик передается во все камеры процесса
+    show.start_in_store(camera=camera, shelf_coordinates=shelves, id_store=ID_STORE, batch=batch)
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import gzip
+import json
+import threading
+import time
+
+from MVP.config import API_BASE_URL, BATCH_WINDOW, BATCH_MAX_RECORDS
+from MVP.upload.uploader import UploadQueue
+
+
+class BatchAggregator:
+    def __init__(self, api_url: str = None, window: float = BATCH_WINDOW, max_records: int = BATCH_MAX_RECORDS,
+                 uploader: UploadQueue = None):
+        """
+        Args:
+            api_url: Эндпоинт пакетной отправки (по умолчанию {API_BASE_URL}/entrance/batch)
+            window: Окно накопления в секундах
+            max_records: Пакет отправляется досрочно, если накоплено столько записей
+            uploader: Очередь отправки (по умолчанию создается своя для api_url)
+        """
+        if api_url is None:
+            api_url = f"{API_BASE_URL}/entrance/batch"
+        self.window = window
+        self.max_records = max_records
+        self._own_uploader = uploader is None
+        self.uploader = uploader if uploader is not None else UploadQueue(api_url=api_url)
+
+        self._lock = threading.Lock()
+        self._records = []
+        self._images = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, record: dict, image: bytes = None):
+        """
+        Добавляет результат камеры в текущий пакет.
+
+        Args:
+            record: Компактная запись (id_store, ip_camera, create_at, void, shelves)
+            image: JPEG изображение (bytes), если политика требует его приложить
+        """
+        with self._lock:
+            if image is not None:
+                name = f"image_{len(self._images)}"
+                self._images[name] = image
+                record = dict(record, image=name)
+            self._records.append(record)
+            full = len(self._records) >= self.max_records
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Сжимает накопленные записи и передает пакет в очередь отправки"""
+        with self._lock:
+            records, images = self._records, self._images
+            self._records, self._images = [], {}
+        if not records:
+            return
+
+        payload = gzip.compress(json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        files = {'payload': ('payload.json.gz', payload, 'application/gzip')}
+        for name, image in images.items():
+            files[name] = (f"{name}.jpg", image, 'image/jpeg')
+        self.uploader.submit({'records': len(records)}, files=files)
+
+    def _run(self):
+        # Отправка по фиксированным тикам, независимо от времени сборки пакета
+        next_tick = time.monotonic() + self.window
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            next_tick += self.window
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка формирования пакета: {e}")
+
+    def start(self):
+        if self._own_uploader:
+            self.uploader.start()
+        self._thread = threading.Thread(target=self._run, name='batch-aggregator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Отправляет последний пакет и останавливает очередь отправки"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.flush()
+        if self._own_uploader:
+            self.uploader.stop()
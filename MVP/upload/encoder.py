@@ -0,0 +1,160 @@
+"""
+Модуль кодирования кадров в JPEG для отправки на API.
+
+Раньше start_in_store вызывал cv2.imencode('.jpg', frame) для кадра в полном
+разрешении с настройками по умолчанию и копировал результат в BytesIO.
+FrameEncoder уменьшает кадр до UPLOAD_MAX_DIMENSION, при необходимости
+обрезает его по области полок, кодирует с качеством UPLOAD_JPEG_QUALITY в
+фоновом потоке и передает результат без лишних копий. Отправляемые
+изображения становятся в несколько раз меньше.
+
+Основные возможности:
+    - Ограничение максимальной стороны кадра и настраиваемое качество JPEG
+    - Необязательная обрезка по ограничивающему прямоугольнику полок (с отступом)
+    - Быстрый кодировщик libjpeg-turbo (пакет PyTurboJPEG), если он установлен,
+      иначе cv2.imencode
+    - Без копий: результат cv2.imencode передается как memoryview на буфер numpy
+    - Кодирование в фоновом потоке (cv2 и turbojpeg отпускают GIL)
+    - Статистика: количество кадров, время кодирования, размер до и после
+
+Классы:
+    FrameEncoder: Кодировщик кадров
+
+Методы FrameEncoder:
+    - encode(frame, shelf_coordinates, name): Кодирует кадр в текущем потоке
+    - encode_async(frame, shelf_coordinates, callback, name): Кодирует кадр в фоновом потоке
+    - stats(): Статистика кодирования
+
+Использование:
+    from MVP.upload.encoder import FrameEncoder
+
+    encoder = FrameEncoder()
+    encoder.encode_async(frame, shelf_coordinates, lambda image: uploader.submit(data, image))
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from MVP.config import UPLOAD_MAX_DIMENSION, UPLOAD_JPEG_QUALITY, UPLOAD_CROP_TO_SHELVES, UPLOAD_CROP_MARGIN
+from MVP.metrics.metrics import get_metrics
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+
+class FrameEncoder:
+    def __init__(self, max_dimension: int = UPLOAD_MAX_DIMENSION, quality: int = UPLOAD_JPEG_QUALITY,
+                 crop_to_shelves: bool = UPLOAD_CROP_TO_SHELVES, crop_margin: int = UPLOAD_CROP_MARGIN):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.crop_to_shelves = crop_to_shelves
+        self.crop_margin = crop_margin
+
+        self._turbo = None
+        if TurboJPEG is not None:
+            try:
+                self._turbo = TurboJPEG()
+            except Exception as e:
+                # Пакет установлен, но библиотека libjpeg-turbo не найдена
+                print(f"libjpeg-turbo недоступен, используется cv2.imencode: {e}")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='encoder')
+
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.encode_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _prepare(self, frame, shelf_coordinates=None):
+        """Обрезает кадр по полкам и уменьшает до max_dimension (срезы numpy без копирования)"""
+        height, width = frame.shape[:2]
+        if self.crop_to_shelves and shelf_coordinates:
+            x1 = max(0, int(min(shelf[0] for shelf in shelf_coordinates)) - self.crop_margin)
+            y1 = max(0, int(min(shelf[1] for shelf in shelf_coordinates)) - self.crop_margin)
+            x2 = min(width, int(max(shelf[2] for shelf in shelf_coordinates)) + self.crop_margin)
+            y2 = min(height, int(max(shelf[3] for shelf in shelf_coordinates)) + self.crop_margin)
+            if x2 > x1 and y2 > y1:
+                frame = frame[y1:y2, x1:x2]
+                height, width = frame.shape[:2]
+
+        if self.max_dimension and max(height, width) > self.max_dimension:
+            scale = self.max_dimension / max(height, width)
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def encode(self, frame, shelf_coordinates=None, name=None):
+        """
+        Кодирует кадр в JPEG.
+
+        Args:
+            name: Имя камеры для метрик времени этапов
+
+        Returns:
+            bytes или memoryview с JPEG данными, либо None при ошибке кодирования
+        """
+        start = time.perf_counter()
+        prepared = self._prepare(frame, shelf_coordinates)
+        if self._turbo is not None:
+            # turbojpeg требует непрерывный массив (после обрезки срез может быть не непрерывным)
+            if not prepared.flags['C_CONTIGUOUS']:
+                prepared = prepared.copy()
+            image = self._turbo.encode(prepared, quality=self.quality)
+        else:
+            success, buffer = cv2.imencode('.jpg', prepared, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            # memoryview на буфер numpy вместо tobytes() и BytesIO - без копирования
+            image = buffer.data if success else None
+
+        elapsed = time.perf_counter() - start
+        metrics = get_metrics()
+        metrics.observe('encode', name, elapsed)
+        if image is not None:
+            metrics.inc('upload_image_bytes_total', name, len(image))
+        with self._lock:
+            self.frames += 1
+            self.encode_time += elapsed
+            self.bytes_in += frame.nbytes
+            self.bytes_out += len(image) if image is not None else 0
+        return image
+
+    def encode_async(self, frame, shelf_coordinates=None, callback=None, name=None):
+        """
+        Кодирует кадр в фоновом потоке и вызывает callback(image) с результатом.
+        Цикл мониторинга не ждет кодирования.
+
+        Returns:
+            concurrent.futures.Future с результатом encode()
+        """
+        def job():
+            try:
+                image = self.encode(frame, shelf_coordinates, name)
+                if image is None:
+                    print("Ошибка кодирования изображения, пропускаем отправку...")
+                elif callback is not None:
+                    callback(image)
+                return image
+            except Exception as e:
+                print(f"Ошибка в потоке кодирования: {e}")
+                return None
+
+        return self._executor.submit(job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'encode_time': self.encode_time,
+                'avg_encode_ms': self.encode_time / self.frames * 1000 if self.frames else 0.0,
+                'avg_size_kb': self.bytes_out / self.frames / 1024 if self.frames else 0.0,
+                'compression': self.bytes_in / self.bytes_out if self.bytes_out else 0.0,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
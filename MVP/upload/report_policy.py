@@ -0,0 +1,129 @@
+"""
+Модуль политики отправки результатов: только значимые изменения и контрольные сигналы.
+
+Раньше start_in_store отправлял округленный процент и полный JPEG каждые
+time_interval секунд, даже если на полке ничего не изменилось. ReportPolicy
+решает для каждого измерения, нужно ли его отправлять и нужно ли прикладывать
+изображение. Это на порядок сокращает трафик и количество записей в БД,
+а реальные изменения (например, опустевшая полка) отправляются сразу.
+
+Правила:
+    - Мертвая зона (dead band): измерение отправляется, если наполнение камеры
+      или любой из полок изменилось больше чем на dead_band процентных пунктов
+      относительно последнего отправленного значения
+    - Минимальный интервал: не чаще одного отчета в min_interval секунд. Интервал
+      считается по времени тиков планировщика (now), а не по окончанию инференса,
+      иначе при min_interval, равном периоду измерений, разброс длительности
+      задерживал бы реальное изменение на целый тик
+    - Максимальный интервал (heartbeat): отчет отправляется не реже max_interval секунд,
+      даже если изменений нет
+    - Изображение прикладывается, если изменение больше image_change
+      или с прошлого изображения прошло image_interval секунд
+
+Классы:
+    ReportPolicy: Политика отправки для нескольких камер (состояние хранится по ключу камеры)
+
+Методы ReportPolicy:
+    - decide(key, void, shelves): Возвращает (отправлять ли, прикладывать ли изображение)
+
+Использование:
+    from MVP.upload.report_policy import ReportPolicy
+
+    policy = ReportPolicy()
+    report, attach_image = policy.decide(camera.ip_camera, void=37, shelves=[40, 12, 75])
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from MVP.config import REPORT_DEAD_BAND, REPORT_DEAD_BANDS, REPORT_MIN_INTERVAL, REPORT_MAX_INTERVAL, \
+    REPORT_IMAGE_CHANGE, REPORT_IMAGE_INTERVAL
+
+
+class ReportPolicy:
+    def __init__(self, dead_band: float = REPORT_DEAD_BAND, dead_bands: dict = None,
+                 min_interval: float = REPORT_MIN_INTERVAL, max_interval: float = REPORT_MAX_INTERVAL,
+                 image_change: float = REPORT_IMAGE_CHANGE, image_interval: float = REPORT_IMAGE_INTERVAL):
+        """
+        Args:
+            dead_band: Мертвая зона по умолчанию (процентные пункты)
+            dead_bands: Индивидуальные мертвые зоны {ключ камеры: значение}
+                        или {ключ камеры: [значение для каждой полки]}
+            min_interval: Минимальный интервал между отчетами камеры (секунды)
+            max_interval: Максимальный интервал между отчетами камеры (секунды)
+            image_change: Изменение, при котором к отчету прикладывается изображение
+            image_interval: Максимальный интервал между изображениями камеры (секунды)
+        """
+        self.dead_band = dead_band
+        self.dead_bands = REPORT_DEAD_BANDS if dead_bands is None else dead_bands
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.image_change = image_change
+        self.image_interval = image_interval
+
+        self._lock = threading.Lock()
+        # Состояние камеры: последние отправленные значения и время отчета/изображения
+        self._state = {}
+
+    def _band(self, key, shelf_index: int = None) -> float:
+        band = self.dead_bands.get(key, self.dead_band)
+        if isinstance(band, (list, tuple)):
+            if shelf_index is None or shelf_index >= len(band):
+                return self.dead_band
+            return band[shelf_index]
+        return band
+
+    def decide(self, key, void: float, shelves: Optional[List[float]] = None,
+               now: float = None) -> Tuple[bool, bool]:
+        """
+        Решает, отправлять ли измерение камеры.
+
+        Args:
+            key: Ключ камеры (обычно IP)
+            void: Процент наполнения камеры
+            shelves: Процент наполнения каждой полки
+            now: Время измерения, например время тика TickScheduler (time.time()).
+                 По умолчанию time.monotonic(); для одной камеры используются одни и те же часы
+
+        Returns:
+            Tuple (report, attach_image)
+        """
+        now = time.monotonic() if now is None else now
+        shelves = list(shelves or [])
+
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                # Первое измерение всегда отправляется вместе с изображением
+                self._state[key] = {'void': void, 'shelves': shelves, 'report_time': now, 'image_time': now}
+                return True, True
+
+            since_report = now - state['report_time']
+            if since_report < 0:
+                # Часы переведены назад - отчет отправляется, отсчет начинается заново
+                since_report = self.max_interval
+            change = abs(void - state['void'])
+            significant = change > self._band(key)
+            if len(shelves) == len(state['shelves']):
+                for index, (value, last) in enumerate(zip(shelves, state['shelves'])):
+                    shelf_change = abs(value - last)
+                    change = max(change, shelf_change)
+                    if shelf_change > self._band(key, index):
+                        significant = True
+            else:
+                # Изменилась разметка полок
+                significant = True
+
+            heartbeat = since_report >= self.max_interval
+            if not heartbeat and (not significant or since_report < self.min_interval):
+                return False, False
+
+            attach_image = change >= self.image_change or now - state['image_time'] >= self.image_interval
+            state.update(void=void, shelves=shelves, report_time=now)
+            if attach_image:
+                state['image_time'] = now
+            return True, attach_image
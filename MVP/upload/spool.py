@@ -0,0 +1,262 @@
+"""
+Модуль локального хранилища (spool) неотправленных результатов.
+
+Когда эндпоинт /entrance/photo недоступен, результат измерения (процент
+наполнения и JPEG кадра) раньше терялся. ResultSpool сохраняет такие
+результаты в локальный SQLite файл рядом с процессом, а UploadQueue
+досылает их пакетами, когда API снова доступен. Магазины с нестабильным
+каналом получают полные временные ряды, а цикл инференса не блокируется.
+
+Основные возможности:
+    - Только добавление в конец (append-only), порядок отправки сохраняется
+    - Ограничение по размеру (SPOOL_MAX_BYTES) и возрасту (SPOOL_MAX_AGE):
+      при превышении удаляются самые старые записи
+    - Пакетное чтение и удаление отправленных записей
+    - Безопасен для использования из нескольких потоков одного процесса
+    - Хранит адрес эндпоинта, поэтому один spool обслуживает очереди разных
+      эндпоинтов (/entrance/photo и /entrance/batch)
+
+Классы:
+    ResultSpool: Хранилище неотправленных результатов
+
+Функции:
+    - get_spool(path): Общее хранилище процесса (все очереди отправки пишут в один файл
+                       через одно соединение, чтобы записи не отправлялись дважды)
+    - worker_spool_path(index): Файл хранилища рабочего процесса супервизора. У каждого
+                                процесса свой файл: процессы не видят записи друг друга
+                                и не досылают одни и те же записи дважды
+    - merge_orphan_spools(active): Переносит записи из файлов процессов, которых больше нет
+                                   (после уменьшения их количества), и из общего файла SPOOL_PATH
+                                   в файл работающего процесса. Вызывается супервизором,
+                                   пока рабочие процессы остановлены
+
+Методы ResultSpool:
+    - append(url, data, files): Сохраняет результат
+    - peek(url, limit): Возвращает самые старые записи эндпоинта [(id, data, files), ...]
+    - delete(ids): Удаляет отправленные записи
+    - merge(path): Переносит все записи другого файла хранилища в конец этого
+    - count(): Количество записей
+
+Использование:
+    from MVP.upload.spool import ResultSpool
+
+    spool = ResultSpool()
+    spool.append(url, {'id_store': 1, 'void': 42}, {'file': ('image.jpg', jpeg_bytes, 'image/jpeg')})
+    for record_id, data, files in spool.peek(url, 50):
+        ...
+    spool.delete([record_id])
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import glob
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+
+from MVP.config import SPOOL_PATH, SPOOL_MAX_BYTES, SPOOL_MAX_AGE
+
+
+class ResultSpool:
+    def __init__(self, path: str = SPOOL_PATH, max_bytes: int = SPOOL_MAX_BYTES, max_age: float = SPOOL_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # Досылать записи может только одна очередь отправки одновременно
+        self.drain_lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL: запись не блокирует чтение, синхронизация реже - дешевле для слабых машин
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                url TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                files BLOB
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS spool_url ON spool (url, id)')
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM spool').fetchone()[0]
+
+    def append(self, url: str, data: dict, files: dict = None):
+        """
+        Сохраняет неотправленный результат и применяет политику хранения.
+
+        Args:
+            url: Эндпоинт, на который нужно дослать результат
+            data: Поля формы
+            files: Файлы формы {поле: (имя файла, bytes, content type)} или None
+        """
+        payload = json.dumps(data, ensure_ascii=False)
+        blob = _pack_files(files) if files else None
+        size = len(payload) + (len(blob) if blob is not None else 0)
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO spool (created_at, url, size, data, files) VALUES (?, ?, ?, ?, ?)',
+                (time.time(), url, size, payload, blob)
+            )
+            self._size += size
+            self._apply_retention()
+
+    def _apply_retention(self):
+        """Удаляет записи старше max_age и самые старые записи сверх max_bytes"""
+        removed = 0
+        if self.max_age:
+            cursor = self._conn.execute('DELETE FROM spool WHERE created_at < ?', (time.time() - self.max_age,))
+            removed += cursor.rowcount
+        while self._size > self.max_bytes:
+            rows = self._conn.execute('SELECT id, size FROM spool ORDER BY id LIMIT 100').fetchall()
+            if not rows:
+                break
+            cutoff, freed = None, 0
+            for record_id, size in rows:
+                cutoff, freed = record_id, freed + size
+                if self._size - freed <= self.max_bytes:
+                    break
+            cursor = self._conn.execute('DELETE FROM spool WHERE id <= ?', (cutoff,))
+            removed += cursor.rowcount
+            self._size -= freed
+        if removed:
+            self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM spool').fetchone()[0]
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Spool: удалено старых записей: {removed}")
+
+    def peek(self, url: str, limit: int) -> list:
+        """Возвращает до limit самых старых записей эндпоинта [(id, data, files), ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, data, files FROM spool WHERE url = ? ORDER BY id LIMIT ?', (url, limit)
+            ).fetchall()
+        return [(record_id, json.loads(data), _unpack_files(blob) if blob is not None else None)
+                for record_id, data, blob in rows]
+
+    def delete(self, ids: list):
+        """Удаляет отправленные записи"""
+        if not ids:
+            return
+        with self._lock:
+            placeholders = ', '.join('?' * len(ids))
+            freed = self._conn.execute(
+                f'SELECT COALESCE(SUM(size), 0) FROM spool WHERE id IN ({placeholders})', ids
+            ).fetchone()[0]
+            self._conn.execute(f'DELETE FROM spool WHERE id IN ({placeholders})', ids)
+            self._size -= freed
+
+    def merge(self, path: str) -> int:
+        """Переносит записи файла path в конец хранилища в прежнем порядке. Возвращает количество записей"""
+        with self._lock:
+            self._conn.execute('ATTACH DATABASE ? AS source', (path,))
+            try:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = 'spool'"
+                ).fetchone()
+                if not exists:
+                    return 0
+                cursor = self._conn.execute(
+                    'INSERT INTO spool (created_at, url, size, data, files) '
+                    'SELECT created_at, url, size, data, files FROM source.spool ORDER BY id'
+                )
+                merged = cursor.rowcount
+            finally:
+                self._conn.execute('DETACH DATABASE source')
+            self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM spool').fetchone()[0]
+            self._apply_retention()
+        return merged
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _pack_files(files: dict) -> bytes:
+    """Упаковывает файлы формы в один blob: длина заголовка, JSON заголовок, содержимое файлов"""
+    header = [[field, filename, content_type, len(content)]
+              for field, (filename, content, content_type) in files.items()]
+    header_bytes = json.dumps(header).encode('utf-8')
+    return b''.join([struct.pack('>I', len(header_bytes)), header_bytes]
+                    + [bytes(content) for _, content, _ in files.values()])
+
+
+def _unpack_files(blob: bytes) -> dict:
+    header_length = struct.unpack('>I', blob[:4])[0]
+    header = json.loads(blob[4:4 + header_length].decode('utf-8'))
+    offset = 4 + header_length
+    files = {}
+    for field, filename, content_type, length in header:
+        files[field] = (filename, blob[offset:offset + length], content_type)
+        offset += length
+    return files
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def worker_spool_path(index: int, path: str = SPOOL_PATH) -> str:
+    """Файл хранилища рабочего процесса: upload_spool.sqlite -> upload_spool.<index>.sqlite"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}{ext}"
+
+
+def merge_orphan_spools(active, path: str = SPOOL_PATH) -> int:
+    """
+    Переносит записи из файлов хранилища процессов, индексов которых нет в active,
+    и из общего файла path в файл процесса с наименьшим индексом из active.
+    Файлы-источники удаляются. Возвращает количество перенесенных записей.
+    """
+    active = sorted(active) or [0]
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(root) + r'\.(\d+)' + re.escape(ext) + '$')
+    orphans = []
+    for candidate in glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}"):
+        match = pattern.match(candidate)
+        if match and int(match.group(1)) not in active:
+            orphans.append(candidate)
+    if os.path.exists(path):
+        orphans.append(path)
+    if not orphans:
+        return 0
+
+    target = ResultSpool(path=worker_spool_path(active[0], path))
+    merged = 0
+    try:
+        for orphan in sorted(orphans):
+            merged += target.merge(orphan)
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(orphan + suffix):
+                    os.remove(orphan + suffix)
+    finally:
+        target.close()
+    if merged:
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Spool: перенесено записей из файлов остановленных "
+              f"процессов: {merged} -> {target.path}")
+    return merged
+
+
+def get_spool(path: str = None) -> ResultSpool:
+    """
+    Возвращает общее для процесса хранилище неотправленных результатов.
+
+    Args:
+        path: Файл хранилища, учитывается только при первом вызове (по умолчанию SPOOL_PATH)
+    """
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = ResultSpool(path=path or SPOOL_PATH)
+        elif path is not None and path != _spool.path:
+            raise ValueError(f"Хранилище процесса уже открыто: {_spool.path}")
+        return _spool
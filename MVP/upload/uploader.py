@@ -0,0 +1,263 @@
+"""
+Модуль фоновой отправки результатов мониторинга на API.
+
+Раньше start_in_store вызывал requests.post прямо в цикле мониторинга с
+таймаутом 10 секунд и новым соединением на каждый запрос, поэтому медленный
+API останавливал весь цикл и сдвигал расписание измерений. UploadQueue
+принимает результаты в ограниченную очередь и отправляет их в фоновом
+потоке, поэтому частота захвата и инференса не зависит от задержек API.
+
+Основные возможности:
+    - Ограниченная очередь: при переполнении вытесняется самый старый результат
+    - Постоянная requests.Session с пулом соединений и keep-alive
+    - Повторы с экспоненциальной задержкой (urllib3 Retry) при ошибках соединения и 5xx
+    - Одна очередь может обслуживать несколько камер процесса
+    - Неотправленные и вытесненные из очереди результаты сохраняются в локальный
+      spool (MVP/upload/spool.py) и досылаются пакетами, когда API снова доступен
+    - В spool попадают только ошибки соединения и ответы 5xx (и 408/429). Ответ 4xx
+      означает, что API не примет результат и при повторе: такой результат отбрасывается
+      и не блокирует досылку остальных
+
+Классы:
+    UploadQueue: Очередь отправки с фоновым обработчиком
+
+Методы UploadQueue:
+    - start(): Запускает фоновый поток отправки
+    - submit(data, image, files): Ставит результат в очередь (не блокирует)
+    - stop(timeout): Отправляет оставшиеся результаты и останавливает поток
+
+Использование:
+    from MVP.upload.uploader import UploadQueue
+
+    uploader = UploadQueue(api_url=f"{API_BASE_URL}/entrance/photo").start()
+    uploader.submit({'id_store': 1, 'void': 42, 'ip_camera': '10.0.0.1'}, jpeg_bytes)
+    uploader.stop()
+
+Автор: [Ваше имя]
+Дата: 2026-01-27
+"""
+
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from MVP.config import UPLOAD_QUEUE_SIZE, UPLOAD_TIMEOUT, UPLOAD_RETRIES, UPLOAD_BACKOFF, UPLOAD_WORKERS, \
+    SPOOL_ENABLED, SPOOL_BATCH_SIZE, SPOOL_RETRY_INTERVAL
+from MVP.metrics.metrics import get_metrics
+from MVP.upload.spool import ResultSpool, get_spool
+
+# Результаты send()
+SENT = 'sent'
+RETRY = 'retry'
+REJECTED = 'rejected'
+# Ответы 4xx, после которых повтор имеет смысл
+RETRY_STATUSES = (408, 429)
+
+
+class UploadQueue:
+    def __init__(self, api_url: str, max_size: int = UPLOAD_QUEUE_SIZE, timeout: float = UPLOAD_TIMEOUT,
+                 retries: int = UPLOAD_RETRIES, backoff: float = UPLOAD_BACKOFF, workers: int = UPLOAD_WORKERS,
+                 spool: ResultSpool = None):
+        self.api_url = api_url
+        self.spool = spool if spool is not None else (get_spool() if SPOOL_ENABLED else None)
+        # Время следующей попытки дослать spool (после ошибки API ждем SPOOL_RETRY_INTERVAL)
+        self._next_drain = 0.0
+        self.timeout = timeout
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_size)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=['POST'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._threads = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"uploader-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, data: dict, image: bytes = None, files: dict = None) -> bool:
+        """
+        Ставит результат в очередь отправки. Никогда не блокирует цикл мониторинга:
+        если очередь заполнена, самый старый результат переносится в spool
+        (или отбрасывается, если spool отключен).
+
+        Args:
+            data: Поля формы (id_store, void, ip_camera)
+            image: JPEG изображение кадра (bytes) или None, отправляется в поле 'file'
+            files: Произвольные файлы формы {поле: (имя файла, bytes, content type)}
+
+        Returns:
+            False, если для нового результата пришлось вытеснить старый
+        """
+        if image is not None:
+            files = dict(files or {}, file=('image.jpg', image, 'image/jpeg'))
+        item = (data, files)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        try:
+            old_data, old_files = self.queue.get_nowait()
+            self.queue.task_done()
+            if self.spool is not None:
+                self.spool.append(self.api_url, old_data, old_files)
+            else:
+                self._drop()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Другая камера успела занять освободившееся место
+            if self.spool is not None:
+                self.spool.append(self.api_url, data, files)
+            else:
+                self._drop()
+        return False
+
+    def _drop(self):
+        self.dropped += 1
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Очередь отправки переполнена, "
+              f"результат отброшен (всего {self.dropped})")
+
+    def send(self, data: dict, files: dict = None) -> str:
+        """
+        Отправляет один результат на API.
+
+        Returns:
+            SENT - отправлен, RETRY - ошибка соединения или 5xx (нужно повторить позже),
+            REJECTED - API отклонил результат (4xx), повтор не поможет
+        """
+        metrics = get_metrics()
+        # Пакеты нескольких камер учитываются под именем 'batch'
+        camera = data.get('ip_camera', 'batch')
+        try:
+            with metrics.timer('upload', camera):
+                response = self.session.post(self.api_url, files=files, data=data, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            metrics.inc('uploads_total', camera, result='error')
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка подключения к API: {e}")
+            return RETRY
+
+        metrics.inc('uploads_total', camera, result='ok' if response.status_code == 200 else 'error')
+        if response.status_code == 200:
+            fields = ', '.join(f"{key}={value}" for key, value in data.items())
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Данные успешно отправлены: {fields}")
+            return SENT
+
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка отправки данных: "
+              f"HTTP {response.status_code} - {response.text}. response: {response}")
+        if 400 <= response.status_code < 500 and response.status_code not in RETRY_STATUSES:
+            return REJECTED
+        return RETRY
+
+    def _reject(self, data):
+        self.rejected += 1
+        fields = ', '.join(f"{key}={value}" for key, value in data.items())
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Результат отклонен API и отброшен: {fields} "
+              f"(всего {self.rejected})")
+
+    def _drain_spool(self):
+        """
+        Досылает пакет результатов из spool. Останавливается на первой ошибке соединения или 5xx,
+        отклоненные API записи (4xx) удаляются и не блокируют остальные
+        """
+        # Пакет забирает только один поток, чтобы записи не отправлялись дважды
+        if not self.spool.drain_lock.acquire(blocking=False):
+            return
+        try:
+            records = self.spool.peek(self.api_url, SPOOL_BATCH_SIZE)
+            if not records:
+                return
+            sent_ids, done_ids = [], []
+            for record_id, data, files in records:
+                status = self.send(data, files)
+                if status == RETRY:
+                    self._next_drain = time.monotonic() + SPOOL_RETRY_INTERVAL
+                    break
+                if status == SENT:
+                    sent_ids.append(record_id)
+                else:
+                    self._reject(data)
+                done_ids.append(record_id)
+            self.spool.delete(done_ids)
+            self.sent += len(sent_ids)
+            if sent_ids:
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Из spool дослано результатов: {len(sent_ids)}")
+        finally:
+            self.spool.drain_lock.release()
+
+    def _run(self):
+        while not self._stop_event.is_set() or not self.queue.empty():
+            try:
+                data, files = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                # Очередь пуста - время дослать накопленное, если API снова доступен
+                if self.spool is not None and not self._stop_event.is_set() \
+                        and time.monotonic() >= self._next_drain:
+                    try:
+                        self._drain_spool()
+                    except Exception as e:
+                        print(f"Ошибка отправки из spool: {e}")
+                continue
+            try:
+                status = self.send(data, files)
+                if status == SENT:
+                    self.sent += 1
+                elif status == REJECTED:
+                    self._reject(data)
+                else:
+                    self.failed += 1
+                    self._save_unsent(data, files)
+            except Exception as e:
+                self.failed += 1
+                print(f"Ошибка в потоке отправки: {e}")
+                self._save_unsent(data, files)
+            finally:
+                self.queue.task_done()
+
+    def _save_unsent(self, data, files):
+        if self.spool is None:
+            return
+        self.spool.append(self.api_url, data, files)
+        self._next_drain = time.monotonic() + SPOOL_RETRY_INTERVAL
+
+    def stop(self, timeout: float = 10):
+        """
+        Дожидается отправки оставшихся результатов (не дольше timeout) и закрывает соединения.
+        Результаты, которые не успели отправить, сохраняются в spool.
+        """
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        while self.spool is not None:
+            try:
+                data, files = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.spool.append(self.api_url, data, files)
+            self.queue.task_done()
+        self.session.close()
@@ -0,0 +1,374 @@
+"""
+HTTP сервис приема результатов мониторинга полок (aiohttp).
+
+Принимает отчеты камер от ShowPicture.start_in_store:
+    POST /entrance/photo - один результат камеры (multipart/form-data, без изображения -
+                           application/x-www-form-urlencoded)
+        поля: id_store, void, ip_camera, create_at (необязательно), file (JPEG, необязательно)
+    POST /entrance/batch - пакет результатов камер процесса (MVP/upload/batch.py)
+        поля: records, payload (payload.json.gz), image_<n> (JPEG)
+    GET /stores/{id_store}/fill - тренд наполнения магазина по агрегатам истории (database/fill_history.py)
+        параметры: from, to (YYYY-MM-DD HH:MM:SS), resolution (5m, 1h, 1d; по умолчанию 1h)
+    GET /health - проверка доступности
+
+Изображения не читаются в память целиком: части multipart пишутся на диск
+блоками по CHUNK_SIZE байт (aiofiles) во временный файл и переименовываются
+после проверки полей. Строки передаются в EntranceBatchWriter, который
+записывает строки всех запросов пакетами (database/batch_writer.py).
+Ответ 200 отправляется после записи строки в БД.
+
+Переменные окружения (.env):
+    API_HOST, API_PORT: адрес сервиса (по умолчанию 0.0.0.0:8000)
+    IMAGE_DIR: каталог для изображений (по умолчанию images)
+    IMAGE_BASE_URL: префикс ссылки на изображение в поле url (по умолчанию путь относительно IMAGE_DIR)
+    API_MAX_IMAGE_BYTES: максимальный размер одного изображения (по умолчанию 10 МБ)
+    API_MAX_BATCH_RECORDS: максимальное количество записей в пакете (по умолчанию 5000)
+    FILL_RAW_RETENTION_DAYS, FILL_PARTITIONS_AHEAD: допустимый диапазон create_at - от начала
+        (сегодня - FILL_RAW_RETENTION_DAYS) до конца (сегодня + FILL_PARTITIONS_AHEAD), то есть
+        только дни с созданными секциями истории наполнения
+"""
+
+import asyncio
+import gzip
+import ipaddress
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta
+
+import aiofiles
+import aiofiles.os
+from aiohttp import web
+from dotenv import load_dotenv
+
+from database.batch_writer import EntranceBatchWriter
+from database.fill_history import RESOLUTIONS
+from database.worker import DatabaseWorker
+
+load_dotenv()
+
+CHUNK_SIZE = 64 * 1024
+FIELD_MAX_BYTES = 1024
+MAX_SHELVES = 64
+PAYLOAD_MAX_BYTES = 10 * 1024 * 1024
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Те же значения, что у FillHistory: строки вне секций shelf_fill_raw не принимаются
+RAW_RETENTION_DAYS = int(os.getenv('FILL_RAW_RETENTION_DAYS', 14))
+PARTITIONS_AHEAD = int(os.getenv('FILL_PARTITIONS_AHEAD', 3))
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def _parse_int(name, value, minimum=None, maximum=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Поле {name} должно быть целым числом: {value!r}")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise ValidationError(f"Поле {name} вне допустимого диапазона: {number}")
+    return number
+
+
+def _parse_camera(value):
+    if not value:
+        raise ValidationError("Не задано поле ip_camera")
+    value = str(value).strip()
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        # Камера может быть задана именем хоста
+        # Имя входит в путь изображения: пустые части ('..', '.host') не допускаются
+        if len(value) > 253 or '' in value.split('.') or \
+                not all(part.isascii() and (part.isalnum() or part in '-.') for part in value):
+            raise ValidationError(f"Некорректное поле ip_camera: {value!r}")
+        return value
+
+
+def _parse_date(value):
+    if not value:
+        return datetime.now().strftime(DATE_FORMAT)
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValidationError(f"Поле create_at должно быть в формате {DATE_FORMAT}: {value!r}")
+
+
+def _parse_shelves(value):
+    if value is None:
+        return None
+    if not isinstance(value, list) or len(value) > MAX_SHELVES:
+        raise ValidationError(f"Поле shelves должно быть списком не длиннее {MAX_SHELVES} значений")
+    return [_parse_int('shelves', shelf, minimum=0, maximum=100) for shelf in value]
+
+
+def _check_create_at(value):
+    """
+    Время измерения должно попадать в дневные секции shelf_fill_raw. Иначе строка
+    ложится в секцию по умолчанию, и создание секции этого дня завершается ошибкой.
+    """
+    today = datetime.combine(date.today(), datetime.min.time())
+    start = today - timedelta(days=RAW_RETENTION_DAYS)
+    end = today + timedelta(days=PARTITIONS_AHEAD + 1)
+    if not start <= datetime.strptime(value, DATE_FORMAT) < end:
+        raise ValidationError(f"Поле create_at вне допустимого диапазона "
+                              f"[{start.strftime(DATE_FORMAT)}, {end.strftime(DATE_FORMAT)}): {value!r}")
+    return value
+
+
+def validate_record(record: dict) -> dict:
+    """Проверяет поля результата камеры и приводит их к типам таблицы"""
+    if not isinstance(record, dict):
+        raise ValidationError(f"Запись должна быть объектом: {record!r}")
+    return {
+        'id_store': _parse_int('id_store', record.get('id_store'), minimum=1),
+        'void': _parse_int('void', record.get('void'), minimum=0, maximum=100),
+        'ip_camera': _parse_camera(record.get('ip_camera')),
+        'create_at': _check_create_at(_parse_date(record.get('create_at'))),
+        'shelves': _parse_shelves(record.get('shelves')),
+    }
+
+
+class EntranceApi:
+    def __init__(self, worker: DatabaseWorker = None, image_dir: str = None, image_base_url: str = None):
+        self.worker = worker
+        self.writer = None
+        self.image_dir = image_dir or os.getenv('IMAGE_DIR', 'images')
+        self.image_base_url = image_base_url if image_base_url is not None else os.getenv('IMAGE_BASE_URL', '')
+        self.max_image_bytes = int(os.getenv('API_MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+        self.max_batch_records = int(os.getenv('API_MAX_BATCH_RECORDS', 5000))
+        self.tmp_dir = os.path.join(self.image_dir, 'tmp')
+
+    # ---------- multipart ----------
+
+    async def _read_field(self, part, limit=FIELD_MAX_BYTES):
+        data = bytearray()
+        while True:
+            chunk = await part.read_chunk(CHUNK_SIZE)
+            if not chunk:
+                break
+            data.extend(chunk)
+            if len(data) > limit:
+                raise ValidationError(f"Поле {part.name} слишком большое")
+        return bytes(data)
+
+    async def _stream_file(self, part):
+        """Пишет часть multipart во временный файл блоками. Возвращает путь к файлу"""
+        path = os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+        size = 0
+        try:
+            async with aiofiles.open(path, 'wb') as f:
+                while True:
+                    chunk = await part.read_chunk(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise ValidationError(f"Изображение {part.name} больше {self.max_image_bytes} байт")
+                    await f.write(chunk)
+        except BaseException:
+            await self._remove(path)
+            raise
+        if size == 0:
+            await self._remove(path)
+            return None
+        return path
+
+    async def _read_multipart(self, request, file_fields):
+        """
+        Читает форму. Текстовые поля возвращаются в fields, файлы из file_fields
+        (или все файлы, если file_fields равен None) - во временных файлах в files.
+        Форма без файлов может прийти как application/x-www-form-urlencoded.
+        """
+        if request.content_type != 'multipart/form-data':
+            # UploadQueue отправляет отчеты без изображения обычной формой
+            try:
+                form = await request.post()
+            except (ValueError, UnicodeDecodeError) as e:
+                raise ValidationError(f"Некорректное тело запроса: {e}")
+            return {name: value for name, value in form.items() if isinstance(value, str)}, {}
+
+        fields, files = {}, {}
+        try:
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == 'payload':
+                    # payload небольшой и читается в память, даже если пришел как файл
+                    fields[part.name] = await self._read_field(part, PAYLOAD_MAX_BYTES)
+                elif part.filename is not None and (file_fields is None or part.name in file_fields):
+                    path = await self._stream_file(part)
+                    if path is not None:
+                        files[part.name] = path
+                else:
+                    fields[part.name] = (await self._read_field(part)).decode('utf-8', errors='replace')
+        except (AssertionError, ValueError) as e:
+            # Некорректный multipart (нет boundary, оборванное тело)
+            await self._cleanup(files)
+            raise ValidationError(f"Некорректное тело запроса: {e}")
+        except BaseException:
+            await self._cleanup(files)
+            raise
+        return fields, files
+
+    async def _remove(self, path):
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def _cleanup(self, files):
+        for path in files.values():
+            await self._remove(path)
+
+    async def _store_image(self, tmp_path, record):
+        """Переносит изображение в каталог магазина и камеры. Возвращает (путь к файлу, значение поля url)"""
+        stamp = record['create_at'].replace('-', '').replace(':', '').replace(' ', '_')
+        relative = os.path.join(str(record['id_store']), record['ip_camera'], f"{stamp}_{uuid.uuid4().hex[:8]}.jpg")
+        path = os.path.join(self.image_dir, relative)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        await aiofiles.os.replace(tmp_path, path)
+        relative = relative.replace(os.sep, '/')
+        return path, f"{self.image_base_url.rstrip('/')}/{relative}" if self.image_base_url else relative
+
+    # ---------- обработчики ----------
+
+    async def photo(self, request):
+        try:
+            fields, files = await self._read_multipart(request, {'file'})
+        except ValueError as e:
+            # Ошибки полей и некорректный multipart
+            return web.json_response({'error': str(e)}, status=400)
+
+        try:
+            record = validate_record(fields)
+        except ValidationError as e:
+            await self._cleanup(files)
+            return web.json_response({'error': str(e)}, status=400)
+
+        path, url = await self._store_image(files['file'], record) if 'file' in files else (None, None)
+        try:
+            await self.writer.add(record['id_store'], record['void'], url, record['create_at'], record['ip_camera'])
+        except Exception:
+            # Строка не записана - изображение без ссылки из БД не сохраняется
+            if path is not None:
+                await self._remove(path)
+            raise
+        return web.json_response({'status': 'ok'})
+
+    async def batch(self, request):
+        try:
+            fields, files = await self._read_multipart(request, None)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        try:
+            payload = fields.get('payload')
+            if not payload:
+                raise ValidationError("Не задан payload")
+            if not isinstance(payload, bytes):
+                raise ValidationError("payload передается только в multipart/form-data")
+            try:
+                records = json.loads(gzip.decompress(payload))
+            except (OSError, ValueError) as e:
+                raise ValidationError(f"Некорректный payload: {e}")
+            if not isinstance(records, list) or len(records) > self.max_batch_records:
+                raise ValidationError("payload должен быть списком не длиннее "
+                                      f"{self.max_batch_records} записей")
+            if 'records' in fields and _parse_int('records', fields['records']) != len(records):
+                raise ValidationError("Количество записей не совпадает с полем records")
+            rows = [(validate_record(record), record.get('image')) for record in records]
+            if any(image is not None and not isinstance(image, str) for _, image in rows):
+                raise ValidationError("Поле image должно быть именем файла")
+        except ValidationError as e:
+            await self._cleanup(files)
+            return web.json_response({'error': str(e)}, status=400)
+
+        writes, stored = [], []
+        try:
+            for record, image in rows:
+                path, url = await self._store_image(files.pop(image), record) if image in files else (None, None)
+                stored.append(path)
+                writes.append(self.writer.add(record['id_store'], record['void'], url, record['create_at'],
+                                              record['ip_camera'], record['shelves']))
+        except BaseException:
+            # Строки еще не переданы в EntranceBatchWriter
+            for coroutine in writes:
+                coroutine.close()
+            for path in stored:
+                if path is not None:
+                    await self._remove(path)
+            raise
+        finally:
+            # Изображения без записей не сохраняются
+            await self._cleanup(files)
+
+        # Строки пакета попадают в одну пакетную запись
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        # Изображения незаписанных строк удаляются, записанные строки сохраняют свои ссылки
+        for path, result in zip(stored, results):
+            if path is not None and isinstance(result, Exception):
+                await self._remove(path)
+        if errors:
+            raise errors[0]
+        return web.json_response({'status': 'ok', 'records': len(rows)})
+
+    async def store_fill(self, request):
+        try:
+            id_store = _parse_int('id_store', request.match_info['id_store'], minimum=1)
+            start = request.query.get('from')
+            end = request.query.get('to')
+            if not start or not end:
+                raise ValidationError("Не заданы параметры from и to")
+            start, end = _parse_date(start), _parse_date(end)
+            resolution = request.query.get('resolution', '1h')
+            if resolution not in RESOLUTIONS:
+                raise ValidationError(f"resolution должен быть одним из {', '.join(RESOLUTIONS)}")
+        except ValidationError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        df = await self.worker.run(self.worker.history.store_trend, id_store, start, end, resolution)
+        df['bucket'] = df['bucket'].astype(str)
+        return web.json_response({'id_store': id_store, 'resolution': resolution,
+                                  'points': df.to_dict(orient='records')})
+
+    async def health(self, request):
+        return web.json_response({
+            'status': 'ok',
+            'writer': self.writer.stats() if self.writer else None,
+            'pool': self.worker.db_km.pool_status() if self.worker else None,
+        })
+
+    # ---------- приложение ----------
+
+    async def _on_startup(self, app):
+        await aiofiles.os.makedirs(self.tmp_dir, exist_ok=True)
+        if self.worker is None:
+            self.worker = DatabaseWorker()
+        self.writer = await EntranceBatchWriter(self.worker).start()
+        # Схема истории наполнения и фоновый пересчет агрегатов
+        await self.worker.history.start()
+
+    async def _on_cleanup(self, app):
+        # Дожидаемся записи принятых строк
+        if self.writer is not None:
+            await self.writer.close()
+        if self.worker is not None:
+            await self.worker.history.close()
+        if self.worker is not None:
+            self.worker.close()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/entrance/photo', self.photo)
+        app.router.add_post('/entrance/batch', self.batch)
+        app.router.add_get('/stores/{id_store}/fill', self.store_fill)
+        app.router.add_get('/health', self.health)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+
+def create_app() -> web.Application:
+    return EntranceApi().create_app()
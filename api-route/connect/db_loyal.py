@@ -1,15 +1,88 @@
+import atexit
+import csv
 import gc
+import io
 import os
-import sys
+import threading
 import time
 import traceback
+from contextlib import contextmanager
 import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text, QueuePool
+from sqlalchemy import create_engine, event, text, QueuePool
 from sqlalchemy import exc
+
+from connect.retry import RetryPolicy
 load_dotenv()
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Строковые значения, которые записываются в БД как NULL
+NULL_STRINGS = ['None', 'nan', '<NA>', 'NaT', 'NaN', '']
+
+
+class PoolStats:
+    """Счетчики пула соединений процесса: выдачи соединений, ожидание свободного соединения, новые подключения"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidated = 0
+
+    def checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def invalidate(self, *args):
+        with self._lock:
+            self.invalidated += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'avg_wait_ms': self.wait_sum / self.checkouts * 1000 if self.checkouts else 0.0,
+                'max_wait_ms': self.wait_max * 1000,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidated': self.invalidated,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который учитывает время ожидания соединения в pool_stats"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_stats.timeout()
+            raise
+        pool_stats.checkout(time.perf_counter() - start)
+        return connection
+
 
 class DB_KM:
     _km = None
@@ -21,14 +94,26 @@ class DB_KM:
         return cls._km
 
     def __init__(self):
-        self.engine_km = None
-        self.engine = None
+        # Singleton: повторный DB_KM() возвращает тот же объект и не должен сбрасывать пул
         if not hasattr(self, 'initialized'):
+            self.engine_km = None
+            self.engine = None
+            self._engine_pid = None
+            self._engine_lock = threading.Lock()
+            # Кэш текстов SQL по (операция, таблица, колонки, конфликт)
+            self._statements = {}
+            # Повторы с экспоненциальной задержкой и общий для процесса автомат защиты БД
+            self.retry = RetryPolicy()
             self.pool_Analitik()
+            atexit.register(self.close_connection_pool_analitik)
             self.initialized = True
 
 
     def pool_Analitik(self):
+        """
+        Создает пул соединений процесса. Параметры пула задаются в .env:
+        DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+        """
         password = os.getenv('DB_PASSWORD')
         user = os.getenv('DB_USER')
         port = os.getenv('DB_PORT')
@@ -36,167 +121,342 @@ class DB_KM:
         database = 'telegram_bots' #os.getenv('DB_NAME') #'telegram_bots'
         try:
             conn_str = f'postgresql://{user}:{password}@{host}:{port}/{database}'
-            self.engine_km = create_engine(conn_str, pool_size=100, max_overflow=100, pool_timeout=300, poolclass=QueuePool)
+            engine = create_engine(
+                conn_str,
+                poolclass=TimedQueuePool,
+                pool_size=int(os.getenv('DB_POOL_SIZE', 10)),
+                max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+                pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+                pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+                # Проверка соединения перед выдачей: после рестарта PostgreSQL не получаем мертвые соединения
+                pool_pre_ping=os.getenv('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),
+            )
+            event.listen(engine, 'connect', pool_stats.connect)
+            event.listen(engine, 'invalidate', pool_stats.invalidate)
+            self.engine_km = engine
+            self._engine_pid = os.getpid()
 
         except Exception as error:
                  print(traceback.format_exc(),error)
 
     def ANALITIC_ENGINE(self):
-
-        if self.engine_km is None:
-            try:
+        """Возвращает пул процесса, создает его при первом обращении или после fork"""
+        if self.engine_km is not None and self._engine_pid == os.getpid():
+            return self.engine_km
+        with self._engine_lock:
+            if self.engine_km is not None and self._engine_pid != os.getpid():
+                # Соединения родительского процесса не закрываем - они принадлежат ему
+                self.engine_km.dispose(close=False)
+                self.engine_km = None
+            if self.engine_km is None:
                 self.pool_Analitik()
-            except Exception as error:
-                print('Ошибка при создании подключения Analitik', traceback.format_exc(), error)
-
-                time.sleep(60)
-                try:
-                    self.engine_km.dispose()
-                    self.pool_Analitik()
-                except Exception as error:
-                    print('Ошибка при восстановлении подключения Analitik', traceback.format_exc(), error)
         return self.engine_km
 
+    def pool_status(self) -> dict:
+        """Состояние пула: размер, занятые и свободные соединения, переполнение и счетчики ожидания"""
+        status = pool_stats.as_dict()
+        status['breaker'] = self.retry.breaker.stats()
+        pool = self.engine_km.pool if self.engine_km is not None else None
+        if pool is not None:
+            status.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow(),
+            })
+        return status
+
     def ANALITIC_TO_DATAFRAME(self,query, params=None):#analitik_to_dataframe
+        def read():
+            with self.ANALITIC_ENGINE().connect() as conn:
+                if params:
+                    return pd.read_sql_query(query, conn, params=params)
+                return pd.read_sql_query(query, conn)
+        return self.retry.call(read, name='ANALITIC_TO_DATAFRAME')
 
-        while True:
-            try:
-                self.engine_km = self.ANALITIC_ENGINE()
-                with self.engine_km.connect() as conn:
-                    if params:
-                        df = pd.read_sql_query(query, conn, params=params)
-                    else:
-                        df = pd.read_sql_query(query, conn)
-                return df
-            except Exception as error:
-                print('Подключение не установлено. Жду... ', traceback.format_exc(), error)
+    def ANALITIC_TO_DATAFRAME_CHUNKS(self, query, params=None, chunk_size=None, dtype=None, arrow=False):
+        """
+        Читает результат запроса частями через курсор на стороне сервера: в памяти
+        одновременно только одна часть, независимо от размера выборки.
+
+        Args:
+            chunk_size: Строк в части (по умолчанию DB_STREAM_CHUNK_ROWS из .env, 50000)
+            dtype: Типы колонок {'колонка': тип} для DataFrame.astype, например
+                   {'id_store': 'int32', 'void': 'float32', 'create_at': 'datetime64[ns]'}
+            arrow: Возвращать pyarrow.RecordBatch вместо DataFrame (нужен пакет pyarrow)
 
+        Yields:
+            pd.DataFrame или pyarrow.RecordBatch с колонками запроса
+        """
+        if arrow and pyarrow is None:
+            raise ImportError("Для arrow=True нужен пакет pyarrow")
+        chunk_size = chunk_size or int(os.getenv('DB_STREAM_CHUNK_ROWS', 50000))
+        statement = text(query) if isinstance(query, str) else query
+
+        def open_cursor():
+            conn = self.ANALITIC_ENGINE().connect().execution_options(stream_results=True,
+                                                                       max_row_buffer=chunk_size)
+            try:
+                return conn, conn.execute(statement, params or {})
+            except BaseException:
+                conn.close()
+                raise
 
+        # Повторяется только открытие курсора: после первой части запрос не перезапускается
+        conn, result = self.retry.call(open_cursor, name='ANALITIC_TO_DATAFRAME_CHUNKS')
+        try:
+            columns = list(result.keys())
+            for rows in result.partitions(chunk_size):
+                df = pd.DataFrame.from_records(rows, columns=columns)
+                if dtype:
+                    df = df.astype({col: kind for col, kind in dtype.items() if col in df.columns})
+                yield pyarrow.RecordBatch.from_pandas(df, preserve_index=False) if arrow else df
+        finally:
+            result.close()
+            conn.close()
 
     def ANALITIC_TO_SCALAR(self,query):
-        while True:
-            try:
-                self.engine_km = self.ANALITIC_ENGINE()
-                with self.engine_km.connect() as conn:
-                    max_km = conn.execute(query)
-                    date_max_km = max_km.scalar()
-                return date_max_km
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_TO_SCALAR. Жду... ', traceback.format_exc(), error)
-
-                time.sleep(60)
-
-
-            #  Загрузка новых данных, загружает данные в таблицы по строчно
-    def analitik_up_update_in_FOR(self,columns_to_update, conflict, df, tabele_name):
-        for col in df.columns:
-            if df[col].dtype.kind in 'ifc':
-                df[col] = df[col].replace(0, np.nan)
-        df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None,'': None},
-                   inplace=True)
-        while True:
+        def scalar():
+            with self.ANALITIC_ENGINE().connect() as conn:
+                return conn.execute(query).scalar()
+        return self.retry.call(scalar, name='ANALITIC_TO_SCALAR')
+
+
+    def _statement(self, kind, tabele_name, columns_to_update, conflict=()):
+        """Возвращает закэшированный SQL для вставки/обновления, чтобы не собирать его при каждом вызове и повторе"""
+        key = (kind, tabele_name, tuple(columns_to_update), tuple(conflict))
+        statement = self._statements.get(key)
+        if statement is not None:
+            return statement
+
+        columns = ', '.join(columns_to_update)
+        if kind == 'upsert':
+            sql = f'''
+                INSERT INTO {tabele_name} ({columns})
+                VALUES ({', '.join([':' + col for col in columns_to_update])})
+                ON CONFLICT ({', '.join(conflict)}) DO UPDATE
+                SET {', '.join([f"{col} = :{col}" for col in columns_to_update])};'''
+        elif kind == 'copy_merge':
+            stage = self._stage_table(tabele_name)
+            update_columns = [col for col in columns_to_update if col not in conflict] or list(columns_to_update)
+            sql = f'''
+                INSERT INTO {tabele_name} ({columns})
+                SELECT {columns} FROM {stage}
+                ON CONFLICT ({', '.join(conflict)}) DO UPDATE
+                SET {', '.join([f"{col} = EXCLUDED.{col}" for col in update_columns])};'''
+        elif kind == 'only_insert':
+            sql = f'''
+                INSERT INTO {tabele_name} ({columns})
+                SELECT {', '.join([':' + col for col in columns_to_update])}
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM {tabele_name}
+                    WHERE {' AND '.join([f'{col} = :{col}' for col in conflict])}
+                );'''
+        else:
+            raise ValueError(f"Неизвестный тип запроса {kind}")
+        statement = self._statements[key] = text(sql)
+        return statement
+
+    @staticmethod
+    def _stage_table(tabele_name):
+        return '_stage_' + tabele_name.replace('.', '_')
+
+    # Подготовка DataFrame к записи: один проход по каждой колонке без копий всего DataFrame
+    @staticmethod
+    def _normalize(df, columns=None, zero_to_null_all=False, integral_floats=False):
+        """
+        Приводит колонки к значениям для БД: пропуски (NaN, NaT, NA) и строки из NULL_STRINGS
+        становятся None, нули в числовых колонках - None (в колонках object - если zero_to_null_all).
+        Исходный DataFrame не изменяется.
+
+        Args:
+            integral_floats: Числа с плавающей точкой без дробной части возвращаются как int
+                             (для COPY в integer колонки)
+
+        Returns:
+            (columns, arrays) - имена колонок и массивы значений (numpy object) в том же порядке
+        """
+        columns = list(df.columns if columns is None else columns)
+        arrays = []
+        for col in columns:
+            values = df[col]
+            kind = values.dtype.kind
+            array = values.to_numpy(dtype=object, copy=True)
+            array[values.isna().to_numpy(dtype=bool)] = None
+            if kind in 'iufc':
+                zeros = (values == 0).to_numpy(dtype=bool, na_value=False)
+                array[zeros] = None
+                if integral_floats and kind == 'f':
+                    numbers = values.to_numpy(dtype=float, na_value=np.nan)
+                    finite = numbers[~np.isnan(numbers)]
+                    if finite.size and np.all(np.mod(finite, 1) == 0):
+                        filled = ~np.isnan(numbers) & ~zeros
+                        array[filled] = numbers[filled].astype(np.int64).astype(object)
+            elif kind == 'O' or values.dtype.name in ('string', 'category'):
+                nulls = values.isin(NULL_STRINGS).to_numpy(dtype=bool)
+                if zero_to_null_all:
+                    nulls = nulls | values.map(lambda value: value is not None and not isinstance(value, (str, bool))
+                                        and value == 0).to_numpy(dtype=bool)
+                array[nulls] = None
+            arrays.append(array)
+        return columns, arrays
+
+    def _records(self, df, columns=None, zero_to_null_all=False):
+        """Возвращает список словарей для executemany после _normalize"""
+        columns, arrays = self._normalize(df, columns, zero_to_null_all=zero_to_null_all)
+        return [dict(zip(columns, row)) for row in zip(*arrays)]
+
+    #  Массовая загрузка: COPY во временную таблицу и одно INSERT ... SELECT ... ON CONFLICT
+    def ANALITIC_COPY_UPSERT(self, columns_to_update, conflict, df, tabele_name, chunk_rows=100000, conn=None):
+        """
+        Загружает DataFrame через COPY во временную таблицу сессии и объединяет его
+        с целевой таблицей одним INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+        Используется для исторических загрузок и дозаписей вместо построчных вставок.
+        С conn выполняется в транзакции вызывающего (ANALITIC_UNIT_OF_WORK).
+        """
+        columns_to_update = list(columns_to_update)
+        conflict = list(conflict)
+        # Одна строка на ключ: ON CONFLICT не может обновить строку дважды в одном запросе
+        df = df.drop_duplicates(subset=conflict, keep='last')
+        # Целые значения с пропусками пишутся в CSV как 12.0 - COPY в integer колонку их не примет,
+        # поэтому числа без дробной части пишутся как int. None в CSV - пустое значение (NULL)
+        columns, arrays = self._normalize(df, columns_to_update, integral_floats=True)
+
+        stage = self._stage_table(tabele_name)
+        copy_sql = f"COPY {stage} ({', '.join(columns_to_update)}) FROM STDIN WITH (FORMAT csv)"
+        merge = self._statement('copy_merge', tabele_name, columns_to_update, conflict)
+        def copy_upsert(conn):
+            # Временная таблица создается на каждый вызов только из загружаемых колонок: без NOT NULL
+            # остальных колонок, без serial/identity умолчаний целевой таблицы и без устаревшей
+            # структуры после изменения схемы. Удаляется при commit, в общей транзакции - здесь
+            conn.execute(text(f'DROP TABLE IF EXISTS pg_temp.{stage}'))
+            conn.execute(text(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+                              f"SELECT {', '.join(columns_to_update)} FROM {tabele_name} WITH NO DATA"))
+            cursor = conn.connection.cursor()
             try:
-                self.engine_km = self.ANALITIC_ENGINE()
-                with self.engine_km.connect() as conn:
-                        for record in df.to_dict(orient='records'):
-
-                            insert_query = text(f'''
-                                                        INSERT INTO {tabele_name} ({', '.join(columns_to_update)}) 
-                                                        VALUES ({', '.join([':' + col for col in columns_to_update])})
-                                                         ON CONFLICT ({', '.join(conflict)}) DO UPDATE 
-                                                        SET {', '.join([f"{col} = :{col}" for col in columns_to_update])};''')
-
-
-                            conn.execute(insert_query, record)
-                            conn.commit()
-                        return
-            except exc.IntegrityError as e:
-                print(f"шибка клчей {e}")
-                # обработчик ошибок ключей
-                #errorExeptionIntegrityError(e)
-            except Exception as error:
-                print('Подключение не установлено analitik_up_update_in_FOR. Жду... ', traceback.format_exc(), error)
-
-                time.sleep(60)
+                for start in range(0, len(df), chunk_rows):
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(
+                        zip(*[array[start:start + chunk_rows] for array in arrays]))
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
             finally:
-                del columns_to_update, conflict, df, tabele_name
-                gc.collect()
+                cursor.close()
+            return conn.execute(merge).rowcount
+        try:
+            if conn is None:
+                return self.ANALITIC_IN_TRANSACTION(copy_upsert, name='ANALITIC_COPY_UPSERT')
+            return copy_upsert(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
+
+    #  Загрузка новых данных, загружает данные в таблицы по строчно
+    def analitik_up_update_in_FOR(self,columns_to_update, conflict, df, tabele_name, conn=None):
+        records = self._records(df)
+        insert_query = self._statement('upsert', tabele_name, columns_to_update, conflict)
+        def upsert_rows(conn, commit=False):
+            for record in records:
+                conn.execute(insert_query, record)
+                if commit:
+                    conn.commit()
+        def upsert():
+            # Без conn каждая строка фиксируется отдельно
+            with self.ANALITIC_ENGINE().connect() as own_conn:
+                upsert_rows(own_conn, commit=True)
+        try:
+            if conn is None:
+                self.retry.call(upsert, name='analitik_up_update_in_FOR')
+            else:
+                upsert_rows(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
 
 
     #  Загрузка новых данных, загружает данные в таблицы
-    def analitik_up_update(self,columns_to_update, conflict, df, tabele_name):
+    def analitik_up_update(self,columns_to_update, conflict, df, tabele_name, conn=None):
         conflict = list(conflict)
-        while True:
-            try:
-                for col in df.columns:
-                    if df[col].dtype.kind in 'ifc':
-                        print(f"обновление {col} {df[col].dtype.kind}")
-                        df.loc[:, col] = df[col].replace(0, np.nan)
-
-                self.engine_km = self.ANALITIC_ENGINE()
-                df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None,'': None} )
-                with self.engine_km.connect() as conn:
-                        records = df.to_dict(orient='records')
-                        insert_query = text(f'''
-                                            INSERT INTO {tabele_name} ({', '.join(columns_to_update)}) 
-                                            VALUES ({', '.join([':' + col for col in columns_to_update])})
-                                             ON CONFLICT ({', '.join(conflict)}) DO UPDATE 
-                                            SET {', '.join([f"{col} = :{col}" for col in columns_to_update])};''')
-                        conn.execute(insert_query, records)
-                        conn.commit()
-                        break
-            except Exception as error:
-                print(f"шибка клчей {error}")
-                print('Подключение не установлено analitik_up_update. Жду... ', traceback.format_exc(), error)
+        insert_query = self._statement('upsert', tabele_name, columns_to_update, conflict)
+        records = self._records(df)
+        def upsert(conn):
+            conn.execute(insert_query, records)
+        try:
+            if conn is None:
+                self.ANALITIC_IN_TRANSACTION(upsert, name='analitik_up_update')
+            else:
+                upsert(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
+
+    @staticmethod
+    def _update_statement(columns_to_update, conflict, tabele_name):
+        columns_to_update = ', '.join([f"{col} = :{col}" for col in columns_to_update])
+        conflict = ' AND '.join([f"{col} = :{col}" for col in conflict])
+        return text(f'UPDATE {tabele_name} SET {columns_to_update} WHERE {conflict}')
 
     #  только обновление
-    def analitik_up_only_update(self,columns_to_update, conflict, df, tabele_name):
-        try:
-            for col in df.columns:
-                if df[col].dtype.kind in 'ifc':
-                    df.loc[:, col] = df[col].replace(0, np.nan)
-            conflict = tuple(conflict)
-            while True:
-                self.engine_km = self.ANALITIC_ENGINE()
-                df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None,'': None})
-                with self.engine_km.begin() as conn:
-                    columns_to_update = ', '.join([f"{col} = :{col}" for col in columns_to_update])
-                    conflict = ' AND '.join([f"{col} = :{col}" for col in conflict])
-                    sql_query = text(f'UPDATE {tabele_name} SET {columns_to_update} WHERE {conflict}')
-                    conn.execute(sql_query, df.to_dict('records'))
-                    conn.commit()
-                    break
-        except Exception as error:
-            print('Подключение не установлено analitik_up_only_update. Жду... ', traceback.format_exc(), error)
-            time.sleep(60)
-        finally:
-            del columns_to_update, conflict, df, tabele_name
-            gc.collect()
+    def analitik_up_only_update(self,columns_to_update, conflict, df, tabele_name, conn=None):
+        records = self._records(df)
+        sql_query = self._update_statement(columns_to_update, conflict, tabele_name)
+        def update(conn):
+            conn.execute(sql_query, records)
+        if conn is None:
+            self.ANALITIC_IN_TRANSACTION(update, name='analitik_up_only_update')
+        else:
+            update(conn)
 
     def ANALITIC_QUERY(self,query, params=None):
-        try:
-            self.engine_km = self.ANALITIC_ENGINE()
-            with self.engine_km.connect() as conn:
-                query_ = text(query)
+        query_ = text(query)
+        def execute():
+            with self.ANALITIC_ENGINE().begin() as conn:
                 if params:
                     conn.execute(query_, params)
                 else:
                     conn.execute(query_)
-                conn.commit()
-        except Exception as error:
-            print('Подключение не установлено ANALITIC_QUERY. Жду... ', traceback.format_exc(), error)
+        self.retry.call(execute, name='ANALITIC_QUERY')
+
+    # Единица работы: одно соединение и одна транзакция на несколько операций
+    @contextmanager
+    def ANALITIC_UNIT_OF_WORK(self):
+        """
+        Выдает соединение с открытой транзакцией. При выходе из блока транзакция
+        фиксируется, при исключении откатывается; соединение возвращается в пул в любом случае.
+        Методы записи с параметром conn (в том числе ANALITIC_COPY_UPSERT, analitik_up_update,
+        analitik_up_update_in_FOR, analitik_up_only_update) выполняются в этой транзакции
+        без своих commit и повторов.
+
+        Использование:
+            with db_km.ANALITIC_UNIT_OF_WORK() as conn:
+                db_km.ANALITIC_ONLY_UPDATE(columns, conflict, df, 'shelf_fill', conn=conn)
+                db_km.ANALITIC_ONLY_INSERT(columns, conflict, df, 'shelf_fill', conn=conn)
+        """
+        conn = self.ANALITIC_RECORD_TRANZACTION_CONNECT()
+        try:
+            with conn.begin():
+                yield conn
+        finally:
+            conn.close()
+
+    def ANALITIC_IN_TRANSACTION(self, func, name=None):
+        """
+        Выполняет func(conn) в одной транзакции. При ошибке соединения транзакция
+        откатывается и func повторяется целиком по правилам self.retry.
+        """
+        def unit():
+            with self.ANALITIC_ENGINE().begin() as conn:
+                return func(conn)
+        return self.retry.call(unit, name=name or getattr(func, '__name__', None))
 
+    # Соединение для ручного управления транзакцией: вызывающий обязан закрыть его.
+    # Для новых мест использовать ANALITIC_UNIT_OF_WORK
     def ANALITIC_RECORD_TRANZACTION_CONNECT(self):
-        while True:
-            try:
-                self.engine_km = self.ANALITIC_ENGINE()
-                conn = self.engine_km.connect()
-                return conn
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_RECORD_TRANZACTION_CONNECT. Жду... ', traceback.format_exc(), error)
-                time.sleep(60)
+        return self.retry.call(lambda: self.ANALITIC_ENGINE().connect(), name='ANALITIC_RECORD_TRANZACTION_CONNECT')
 
 
+    # Запросы внутри открытой транзакции не повторяются: после ошибки транзакцию нужно откатить целиком
     def ANALITIC_RECORD_TRANZACTION_query(self, query, conn,  params = None,):
         try:
             quer_ = text(query)
@@ -204,81 +464,44 @@ class DB_KM:
                 conn.execute(quer_, params)
             else:
                 conn.execute(quer_)
-        except Exception as error:
-            print('Подключение не установлено ANALITIC_RECORD_TRANZACTION_query. Жду... ', traceback.format_exc(),
-                  error)
-            time.sleep(60)
         finally:
             del query, params
             gc.collect()
 
     def TRANZACTION_UPDATE(self, columns_to_update, conflict, df, tabele_name, conn=None):
-        for col in df.columns:
-            if df[col].dtype.kind in 'ifc':
-                df.loc[:, col] = df[col].replace(0, np.nan)
-        while True:
-            try:
-                if conn is None:
-                    conn = self.ANALITIC_RECORD_TRANZACTION_CONNECT()
-                df = df.replace(
-                    {'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None, '': None,
-                     0: None})
-
-                columns_to_update = ', '.join([f"{col} = :{col}" for col in columns_to_update])
-                conflict = ' AND '.join([f"{col} = :{col}" for col in conflict])
-                sql_query = text(f'UPDATE {tabele_name} SET {columns_to_update} WHERE {conflict}')
-
-                conn.execute(sql_query, df.to_dict('records'))
-                break
-
-            except exc.IntegrityError as e:
-                print(f"шибка клчей {e}")
-                # обработчик ошибок ключей
-                # errorExeptionIntegrityError(e)
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_ONLY_UPDATE. Жду... ', traceback.format_exc())
-
-                time.sleep(60)
-
-    def TRANZACTION_INSERT(self, columns_to_update: list, conflict: list, df:pd.DataFrame, table_name: str, conn = None, ):
+        records = self._records(df, zero_to_null_all=True)
+        sql_query = self._update_statement(columns_to_update, conflict, tabele_name)
+        def update(conn):
+            conn.execute(sql_query, records)
         try:
-            for col in df.columns:
-                if df[col].dtype.kind in 'ifc':
-                    df.loc[:, col] = df[col].replace(0, np.nan)
             if conn is None:
-                conn = self.ANALITIC_RECORD_TRANZACTION_CONNECT()
-
-            df = df.replace(0, np.nan)
-            df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None, '': None})
-            records = df.to_dict(orient='records')
-            insert_query = text(f'''
-                                                    INSERT INTO {table_name} ({', '.join(columns_to_update)}) 
-                                                    VALUES ({', '.join([':' + col for col in columns_to_update])})
-                                                    ON CONFLICT ({', '.join(conflict)}) DO UPDATE 
-                                                    SET {', '.join([f"{col} = :{col}" for col in columns_to_update])};''')
-            conn.execute(insert_query, records)
-            """with conn.begin():
-                conn.execute(insert_query, records)
-                conn.commit()"""
-            del columns_to_update, conflict, df, table_name
-            gc.collect()
-
-        except Exception as error:
-            print('Подключение не установлено ANALITIC_RECORD_TRANZACTION_INSERT. Жду... ', traceback.format_exc())
+                self.ANALITIC_IN_TRANSACTION(update, name='TRANZACTION_UPDATE')
+            else:
+                update(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
 
-            time.sleep(60)
+    def TRANZACTION_INSERT(self, columns_to_update: list, conflict: list, df:pd.DataFrame, table_name: str, conn = None, ):
+        records = self._records(df, zero_to_null_all=True)
+        insert_query = self._statement('upsert', table_name, columns_to_update, conflict)
+        def insert(conn):
+            conn.execute(insert_query, records)
+        if conn is None:
+            self.ANALITIC_IN_TRANSACTION(insert, name='TRANZACTION_INSERT')
+        else:
+            insert(conn)
 
 
 
 
 
-    # обовление с последующей вставкой
+    # обовление с последующей вставкой: одна транзакция, при ошибке не остается обновления без вставки
     def ANALITIC_UPDATE_AND_INSERT(self,columns_to_update, conflict, df, tabele_name):
-        self.ANALITIC_ONLY_UPDATE(columns_to_update, conflict, df, tabele_name)
-        self.ANALITIC_ONLY_INSERT(columns_to_update, conflict, df, tabele_name)
-        del columns_to_update, conflict, df, tabele_name
-        gc.collect()
-        return
+        def update_and_insert(conn):
+            self.ANALITIC_ONLY_UPDATE(columns_to_update, conflict, df, tabele_name, conn=conn)
+            self.ANALITIC_ONLY_INSERT(columns_to_update, conflict, df, tabele_name, conn=conn)
+        self.ANALITIC_IN_TRANSACTION(update_and_insert, name='ANALITIC_UPDATE_AND_INSERT')
 
 
     # простая вставка без проверки конфликтов
@@ -287,122 +510,63 @@ class DB_KM:
         Простая вставка данных без проверки конфликтов.
         Используется когда в таблице нет уникальных ограничений или нужно просто добавить записи.
         """
-        for col in df.columns:
-            if df[col].dtype.kind in 'ifc':
-                df.loc[:, col] = df[col].replace(0, np.nan)
-        while True:
-            try:
-                if conn is None:
-                    self.engine_km = self.ANALITIC_ENGINE()
-                    conn = self.engine_km.connect()
-                    need_commit = True
-                else:
-                    need_commit = False
-                
-                df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None, '': None})
-                records = df.to_dict(orient='records')
-                insert_query = text(f'''
-                    INSERT INTO {tabele_name} ({', '.join(columns_to_update)}) 
-                    VALUES ({', '.join([':' + col for col in columns_to_update])});''')
-                conn.execute(insert_query, records)
-                if need_commit:
-                    conn.commit()
-                    conn.close()
-                break
-            except exc.IntegrityError as e:
-                print(f"Ошибка целостности данных {e}")
-                if need_commit:
-                    conn.rollback()
-                    conn.close()
-                raise
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_SIMPLE_INSERT. Жду... ', traceback.format_exc(), error)
-                if need_commit and conn:
-                    conn.close()
-                time.sleep(60)
+        records = self._records(df)
+        insert_query = text(f'''
+            INSERT INTO {tabele_name} ({', '.join(columns_to_update)}) 
+            VALUES ({', '.join([':' + col for col in columns_to_update])});''')
+        def insert(conn):
+            conn.execute(insert_query, records)
+        try:
+            if conn is None:
+                self.ANALITIC_IN_TRANSACTION(insert, name='ANALITIC_SIMPLE_INSERT')
+            else:
+                insert(conn)
+        except exc.IntegrityError as e:
+            print(f"Ошибка целостности данных {e}")
+            raise
 
     #только вставка
-    def ANALITIC_ONLY_INSERT(self,columns_to_update, conflict, df, tabele_name):
-        for col in df.columns:
-            if df[col].dtype.kind in 'ifc':
-                df.loc[:, col] = df[col].replace(0, np.nan)
-        while True:
-            try:
-                self.engine_km = self.ANALITIC_ENGINE()
-                df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None,'': None})
-                with self.engine_km.connect() as conn:
-                        records = df.to_dict(orient='records')
-                        insert_query =text(f'''
-                                                INSERT INTO {tabele_name} ({', '.join(columns_to_update)}) 
-                                                SELECT {', '.join([':' + col for col in columns_to_update])}
-                                               
-                                                WHERE NOT EXISTS (
-                                                    SELECT 1 
-                                                    FROM {tabele_name}
-                                                    WHERE 1 = 1 and {' AND '.join([f'{col} = :' + col for col in conflict]) 
-                                                    if len(conflict) > 1 else f' {conflict[0]} = :{conflict[0]}'}
-                                                );
-                                               
-                                                ''')
-                        result = conn.execute(insert_query, records)
-                        conn.commit()
-                        if result.rowcount > 0:
-                            return  True
-                        else:
-                            return False
-
-
-            except exc.IntegrityError as e:
-                print(f"шибка клчей {e}")
-                # обработчик ошибок ключей
-                # errorExeptionIntegrityError(e)
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_ONLY_INSERT. Жду... ', traceback.format_exc())
-
-                time.sleep(60)
+    def ANALITIC_ONLY_INSERT(self,columns_to_update, conflict, df, tabele_name, conn=None):
+        insert_query = self._statement('only_insert', tabele_name, columns_to_update, conflict)
+        records = self._records(df)
+        def insert(conn):
+            return conn.execute(insert_query, records).rowcount > 0
+        try:
+            if conn is None:
+                return self.ANALITIC_IN_TRANSACTION(insert, name='ANALITIC_ONLY_INSERT')
+            return insert(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
 
 
 
     #  только обновление
     def ANALITIC_ONLY_UPDATE(self, columns_to_update, conflict, df, tabele_name, conn=None):
-        for col in df.columns:
-            if df[col].dtype.kind in 'ifc':
-                df.loc[:, col] = df[col].replace(0, np.nan)
-        while True:
-            try:
-
-                self.engine_km = self.ANALITIC_ENGINE()
-                df = df.replace({'None': None, 'nan': None, '<NA>': None, "NaT": None, 'NaN': None, np.nan: None,'': None, 0: None})
-                with self.engine_km.connect() as conn:
-                    columns_to_update = ', '.join([f"{col} = :{col}" for col in columns_to_update])
-                    conflict = ' AND '.join([f"{col} = :{col}" for col in conflict])
-                    sql_query = text(f'UPDATE {tabele_name} SET {columns_to_update} WHERE {conflict}')
-                    try:
-                        conn.execute(sql_query, df.to_dict('records'))
-                        conn.commit()
-                        break
-                    except Exception as error:
-                        print(traceback.format_exc())
-                        sys.exit()
-            except exc.IntegrityError as e:
-                print(f"шибка клчей {e}")
-                # обработчик ошибок ключей
-                # errorExeptionIntegrityError(e)
-            except Exception as error:
-                print('Подключение не установлено ANALITIC_ONLY_UPDATE. Жду... ', traceback.format_exc())
-
-                time.sleep(60)
+        records = self._records(df, zero_to_null_all=True)
+        sql_query = self._update_statement(columns_to_update, conflict, tabele_name)
+        def update(conn):
+            conn.execute(sql_query, records)
+        try:
+            if conn is None:
+                self.ANALITIC_IN_TRANSACTION(update, name='ANALITIC_ONLY_UPDATE')
+            else:
+                update(conn)
+        except exc.IntegrityError as e:
+            print(f"шибка клчей {e}")
+            raise
 
 
     # закрытие пула
     def close_connection_pool_analitik(self):
 
-        if self.engine_km:
-            try:
-                self.engine_km.dispose()
-            except Exception as error:
-                print('Ошибка при закрытии пула Analitik ', traceback.format_exc())
-                time.sleep(60)
+        with self._engine_lock:
+            if self.engine_km is not None and self._engine_pid == os.getpid():
+                try:
+                    self.engine_km.dispose()
+                except Exception:
+                    print('Ошибка при закрытии пула Analitik ', traceback.format_exc())
+            self.engine_km = None
 if __name__ == '__main__':
     df = DB_KM().ANALITIC_TO_DATAFRAME("select * from spr_client limit 10")
     print(df)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import exc
+
+
+# Ошибки соединения, после которых запрос имеет смысл повторить.
+# Ошибки данных и SQL (IntegrityError, ProgrammingError, DataError) не повторяются
+RETRYABLE_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError,
+                    ConnectionError, TimeoutError)
+
+
+class CircuitOpenError(RuntimeError):
+    """БД признана недоступной: запрос не выполняется до истечения DB_BREAKER_RESET секунд"""
+
+
+class CircuitBreaker:
+    """
+    Общий для процесса автомат защиты БД.
+
+    После failure_threshold ошибок соединения подряд переходит в состояние open:
+    запросы сразу получают CircuitOpenError, не занимая потоки и соединения.
+    Через reset_timeout секунд пропускает один пробный запрос (half_open):
+    успех закрывает автомат, ошибка снова открывает его.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold or int(os.getenv('DB_BREAKER_THRESHOLD', 5))
+        self.reset_timeout = reset_timeout or float(os.getenv('DB_BREAKER_RESET', 30))
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe = False
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probe = False
+            if self.state == 'half_open' and not self._probe:
+                # Пробный запрос: остальные ждут его результата
+                self._probe = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"БД недоступна, запросы отклоняются еще {retry_in:.0f} с")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Соединение с БД восстановлено")
+            self.state = 'closed'
+            self.failures = 0
+            self._probe = False
+
+    def release_probe(self):
+        with self._lock:
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                if self.state == 'closed':
+                    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] БД недоступна ({self.failures} ошибок подряд), "
+                          f"запросы отклоняются {self.reset_timeout:g} с")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class RetryPolicy:
+    """
+    Повтор запросов к БД с экспоненциальной задержкой и случайным разбросом (full jitter).
+
+    Задержка перед попыткой n: random(0, min(max_delay, base_delay * 2 ** n)).
+    После max_attempts попыток ошибка передается вызывающему. Все попытки
+    проходят через общий CircuitBreaker.
+
+    Переменные окружения (.env):
+        DB_RETRY_ATTEMPTS: количество попыток (по умолчанию 5)
+        DB_RETRY_BASE_DELAY: начальная задержка в секундах (по умолчанию 0.5)
+        DB_RETRY_MAX_DELAY: максимальная задержка в секундах (по умолчанию 30)
+        DB_BREAKER_THRESHOLD, DB_BREAKER_RESET: параметры CircuitBreaker
+    """
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None,
+                 breaker: CircuitBreaker = None):
+        self.max_attempts = max_attempts or int(os.getenv('DB_RETRY_ATTEMPTS', 5))
+        self.base_delay = base_delay or float(os.getenv('DB_RETRY_BASE_DELAY', 0.5))
+        self.max_delay = max_delay or float(os.getenv('DB_RETRY_MAX_DELAY', 30))
+        self.breaker = breaker or CircuitBreaker()
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args, name: str = None, attempts: int = None, **kwargs):
+        """
+        Выполняет func(*args, **kwargs) с повторами.
+
+        Args:
+            name: Имя операции для лога
+            attempts: Количество попыток вместо max_attempts (1 - без повторов,
+                      например для запроса внутри открытой транзакции)
+        """
+        name = name or getattr(func, '__name__', 'query')
+        attempts = attempts or self.max_attempts
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts or self.breaker.state == 'open':
+                    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Подключение не установлено {name}, "
+                          f"попыток: {attempt + 1}: {error}")
+                    raise
+                delay = self.delay(attempt)
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Подключение не установлено {name}. "
+                      f"Повтор через {delay:.1f} с ({attempt + 1}/{attempts}): {error}")
+                time.sleep(delay)
+            except exc.DBAPIError as error:
+                # Ошибка запроса от работающей БД
+                if error.connection_invalidated:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            except Exception:
+                # Ошибка не связана с БД и ничего не говорит о ее состоянии
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
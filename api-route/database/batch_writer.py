@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+
+
+class EntranceBatchWriter:
+    """
+    Пакетная запись строк store_entrances (write-behind).
+
+    Строки от всех запросов собираются не дольше DB_BATCH_MAX_DELAY_MS
+    или до DB_BATCH_MAX_ROWS строк и записываются одним многострочным
+    INSERT в одной транзакции. Каждый вызов add() ждет записи своей строки:
+    при ошибке исключение получают все запросы пакета. Если фоновая задача
+    записи завершилась с ошибкой, ожидающие и новые вызовы add() получают
+    исключение, а не ждут бесконечно. Количество коммитов растет с количеством
+    пакетов, а не с количеством камер.
+    """
+
+    def __init__(self, worker, max_rows: int = None, max_delay_ms: float = None, concurrency: int = None):
+        self.worker = worker
+        # Явно переданный 0 (например, max_delay_ms=0 - без ожидания) не заменяется значением по умолчанию
+        self.max_rows = max_rows if max_rows is not None else int(os.getenv('DB_BATCH_MAX_ROWS', 500))
+        if max_delay_ms is None:
+            max_delay_ms = float(os.getenv('DB_BATCH_MAX_DELAY_MS', 50))
+        self.max_delay = max_delay_ms / 1000
+        self.concurrency = concurrency if concurrency is not None else int(os.getenv('DB_BATCH_CONCURRENCY', 2))
+        self.slow_ms = float(os.getenv('DB_BATCH_SLOW_MS', 1000))
+
+        self._rows = []
+        self._writes = set()
+        self._closing = False
+        self._task = None
+
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.last_latency = 0.0
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def add(self, id_store: int, void: int, url: str = None, create_at: str = None, ip_camera: str = None,
+                  shelves: list = None):
+        """Добавляет строку в пакет и ждет ее записи в БД (ip_camera и shelves - для истории наполнения)"""
+        if self._task is None or self._task.done():
+            raise RuntimeError("Пакетная запись store_entrances не запущена или остановлена")
+        future = asyncio.get_running_loop().create_future()
+        self._rows.append(({'id_store': id_store, 'void': void, 'url': url, 'create_at': create_at,
+                            'ip_camera': ip_camera, 'shelves': shelves}, future))
+        self._wakeup.set()
+        if len(self._rows) >= self.max_rows:
+            self._full.set()
+        await future
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run(self):
+        error = RuntimeError("Пакетная запись store_entrances остановлена")
+        try:
+            await self._collect()
+        except Exception as e:
+            print(f"Пакетная запись store_entrances остановлена с ошибкой: {e}")
+            error = e
+        finally:
+            # Строки, не переданные в запись (ошибка или отмена задачи), не должны ждать вечно
+            self._fail(self._rows, error)
+            self._rows = []
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closing and not self._rows):
+            await self._wakeup.wait()
+            # Добираем пакет, пока он не заполнен и не истекло время ожидания
+            deadline = loop.time() + self.max_delay
+            while len(self._rows) < self.max_rows and not self._closing:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._rows = self._rows[:self.max_rows], self._rows[self.max_rows:]
+            if not self._rows:
+                self._wakeup.clear()
+            if batch:
+                try:
+                    await self._slots.acquire()
+                except BaseException:
+                    # Пакет еще не передан в запись - его строки завершает _run
+                    self._rows = batch + self._rows
+                    raise
+                task = asyncio.create_task(self._write(batch))
+                self._writes.add(task)
+                task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            await self.worker.run(self.worker.insert_entrances, [row for row, _ in batch])
+        except Exception as error:
+            self.failed += len(batch)
+            print(f"Ошибка записи пакета store_entrances ({len(batch)} строк): {error}")
+            self._fail(batch, error)
+        except BaseException:
+            # Отмена задачи записи: результат пакета неизвестен
+            self._fail(batch, RuntimeError("Запись пакета store_entrances прервана"))
+            raise
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self._slots.release()
+            latency = time.perf_counter() - start
+            self.batches += 1
+            self.rows += len(batch)
+            self.last_latency = latency
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+            if latency * 1000 >= self.slow_ms:
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Медленная запись пакета store_entrances: "
+                      f"{len(batch)} строк за {latency * 1000:.0f} мс")
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'failed': self.failed,
+            'pending': len(self._rows),
+            'avg_rows': self.rows / self.batches if self.batches else 0.0,
+            'avg_latency_ms': self.latency_sum / self.batches * 1000 if self.batches else 0.0,
+            'max_latency_ms': self.latency_max * 1000,
+            'last_latency_ms': self.last_latency * 1000,
+        }
+
+    async def close(self):
+        """Записывает оставшиеся строки и останавливает запись"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        self._task = None
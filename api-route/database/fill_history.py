@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fill_history.sql')
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+BUCKET_MINUTES = 5
+# Полка для строки камеры целиком (поле void результата камеры)
+CAMERA_SHELF = -1
+RESOLUTIONS = ('5m', '1h', '1d')
+
+# Начало 5-минутного интервала в SQL
+BUCKET_SQL = ("date_trunc('hour', create_at) "
+              f"+ floor(extract(minute FROM create_at) / {BUCKET_MINUTES}) * interval '{BUCKET_MINUTES} minutes'")
+
+ROLLUP_5M = text(f"""
+    INSERT INTO shelf_fill_5m (id_store, ip_camera, shelf, bucket, samples, void_sum, void_min, void_max, minutes_below)
+    SELECT id_store, ip_camera, shelf, {BUCKET_SQL}, count(*), sum(void), min(void), max(void),
+           {BUCKET_MINUTES}.0 * count(*) FILTER (WHERE void < :threshold) / count(*)
+    FROM shelf_fill_raw
+    WHERE create_at >= :start AND create_at < :end AND {BUCKET_SQL} = ANY(:buckets)
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (id_store, bucket, ip_camera, shelf) DO UPDATE
+    SET samples = EXCLUDED.samples, void_sum = EXCLUDED.void_sum, void_min = EXCLUDED.void_min,
+        void_max = EXCLUDED.void_max, minutes_below = EXCLUDED.minutes_below
+""")
+
+# Часовые и дневные агрегаты пересчитываются из агрегатов меньшего интервала
+ROLLUP_UP = """
+    INSERT INTO {target} (id_store, ip_camera, shelf, bucket, samples, void_sum, void_min, void_max, minutes_below)
+    SELECT id_store, ip_camera, shelf, date_trunc('{unit}', bucket), sum(samples), sum(void_sum), min(void_min),
+           max(void_max), sum(minutes_below)
+    FROM {source}
+    WHERE bucket >= :start AND bucket < :end AND date_trunc('{unit}', bucket) = ANY(:buckets)
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (id_store, bucket, ip_camera, shelf) DO UPDATE
+    SET samples = EXCLUDED.samples, void_sum = EXCLUDED.void_sum, void_min = EXCLUDED.void_min,
+        void_max = EXCLUDED.void_max, minutes_below = EXCLUDED.minutes_below
+"""
+ROLLUP_1H = text(ROLLUP_UP.format(target='shelf_fill_1h', source='shelf_fill_5m', unit='hour'))
+ROLLUP_1D = text(ROLLUP_UP.format(target='shelf_fill_1d', source='shelf_fill_1h', unit='day'))
+
+
+def _bucket(create_at: str) -> datetime:
+    moment = datetime.strptime(create_at, DATE_FORMAT)
+    return moment.replace(minute=moment.minute - moment.minute % BUCKET_MINUTES, second=0)
+
+
+class FillHistory:
+    """
+    История наполнения полок с агрегатами по 5 минутам, часам и дням (схема в fill_history.sql).
+
+    Сырые измерения пишутся в секционированную по дням таблицу shelf_fill_raw в той же
+    транзакции, что и store_entrances, и отмечают свой 5-минутный интервал в shelf_fill_dirty.
+    Фоновая задача пересчитывает только отмеченные интервалы и содержащие их часы и дни,
+    поэтому досланные из spool результаты тоже попадают в агрегаты. Запросы трендов
+    магазина читают только агрегаты.
+
+    Переменные окружения (.env):
+        FILL_LOW_THRESHOLD: порог наполнения для minutes_below, % (по умолчанию 30)
+        FILL_ROLLUP_INTERVAL: период пересчета агрегатов, секунды (по умолчанию 60)
+        FILL_MAINTENANCE_INTERVAL: период создания и удаления секций, секунды (по умолчанию 3600)
+        FILL_RAW_RETENTION_DAYS: хранение сырых измерений, дни (по умолчанию 14)
+        FILL_5M_RETENTION_DAYS: хранение 5-минутных агрегатов, дни (по умолчанию 90)
+        FILL_PARTITIONS_AHEAD: количество дневных секций, создаваемых заранее (по умолчанию 3)
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.db_km = worker.db_km
+        self.threshold = int(os.getenv('FILL_LOW_THRESHOLD', 30))
+        self.rollup_interval = float(os.getenv('FILL_ROLLUP_INTERVAL', 60))
+        self.maintenance_interval = float(os.getenv('FILL_MAINTENANCE_INTERVAL', 3600))
+        self.raw_retention_days = int(os.getenv('FILL_RAW_RETENTION_DAYS', 14))
+        self.retention_5m_days = int(os.getenv('FILL_5M_RETENTION_DAYS', 90))
+        self.partitions_ahead = int(os.getenv('FILL_PARTITIONS_AHEAD', 3))
+        self.schema_ready = False
+        self._task = None
+
+    # ---------- запись ----------
+
+    @staticmethod
+    def raw_rows(rows: list) -> list:
+        """Строки shelf_fill_raw из строк store_entrances: камера целиком и каждая полка"""
+        raw = []
+        for row in rows:
+            if not row.get('ip_camera'):
+                continue
+            base = {'id_store': row['id_store'], 'ip_camera': row['ip_camera'], 'create_at': row['create_at']}
+            raw.append(dict(base, shelf=CAMERA_SHELF, void=row['void']))
+            for shelf, void in enumerate(row.get('shelves') or ()):
+                raw.append(dict(base, shelf=shelf, void=void))
+        return raw
+
+    def insert(self, conn, rows: list):
+        """Записывает измерения в открытой транзакции вызывающего (DatabaseWorker.insert_entrances)"""
+        raw = self.raw_rows(rows)
+        if not raw:
+            return
+        columns = ('id_store', 'ip_camera', 'shelf', 'void', 'create_at')
+        values = ', '.join(
+            '(' + ', '.join(f":{column}_{index}" for column in columns) + ')' for index in range(len(raw))
+        )
+        params = {f"{column}_{index}": row[column] for index, row in enumerate(raw) for column in columns}
+        conn.execute(text(f"INSERT INTO shelf_fill_raw ({', '.join(columns)}) VALUES {values}"), params)
+
+        buckets = sorted({_bucket(row['create_at']) for row in raw})
+        values = ', '.join(f"(:bucket_{index})" for index in range(len(buckets)))
+        # DO UPDATE, а не DO NOTHING: блокировка отметки до commit не дает rollup удалить ее,
+        # не увидев сырых строк этой транзакции
+        conn.execute(text(f"INSERT INTO shelf_fill_dirty (bucket) VALUES {values} "
+                          f"ON CONFLICT (bucket) DO UPDATE SET bucket = EXCLUDED.bucket"),
+                     {f"bucket_{index}": bucket for index, bucket in enumerate(buckets)})
+
+    # ---------- обслуживание ----------
+
+    def ensure_schema(self):
+        """Создает таблицы, функции и секции (скрипт идемпотентен)"""
+        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            schema = f.read()
+
+        def create(conn):
+            # Скрипт из нескольких команд выполняется курсором драйвера без подстановки параметров
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(schema)
+            finally:
+                cursor.close()
+            conn.execute(text("SELECT fill_history_create_partitions(:back, :ahead)"),
+                         {'back': self.raw_retention_days, 'ahead': self.partitions_ahead})
+        self.db_km.ANALITIC_IN_TRANSACTION(create, name='fill_history_schema')
+        self.schema_ready = True
+
+    def rollup(self) -> int:
+        """Пересчитывает агрегаты отмеченных интервалов. Возвращает количество интервалов"""
+        def rollup(conn):
+            # Блокировки отметок по порядку - как в insert, без взаимных блокировок с записью
+            buckets = conn.execute(text(
+                "DELETE FROM shelf_fill_dirty WHERE bucket IN "
+                "(SELECT bucket FROM shelf_fill_dirty ORDER BY bucket FOR UPDATE) RETURNING bucket"
+            )).scalars().all()
+            if not buckets:
+                return 0
+            start, end = min(buckets), max(buckets) + timedelta(minutes=BUCKET_MINUTES)
+            conn.execute(ROLLUP_5M, {'threshold': self.threshold, 'start': start, 'end': end,
+                                     'buckets': list(buckets)})
+
+            hours = sorted({bucket.replace(minute=0) for bucket in buckets})
+            conn.execute(ROLLUP_1H, {'start': hours[0], 'end': hours[-1] + timedelta(hours=1), 'buckets': hours})
+
+            days = sorted({hour.replace(hour=0) for hour in hours})
+            conn.execute(ROLLUP_1D, {'start': days[0], 'end': days[-1] + timedelta(days=1), 'buckets': days})
+            return len(buckets)
+        # Отметки удаляются в той же транзакции: при ошибке интервалы будут пересчитаны в следующий раз
+        return self.db_km.ANALITIC_IN_TRANSACTION(rollup, name='fill_history_rollup')
+
+    def maintain(self):
+        """Создает секции наперед и удаляет сырые измерения и 5-минутные агрегаты старше срока хранения"""
+        def maintain(conn):
+            created = conn.execute(text("SELECT fill_history_create_partitions(0, :ahead)"),
+                                   {'ahead': self.partitions_ahead}).scalar()
+            dropped = conn.execute(text("SELECT fill_history_drop_partitions(:keep)"),
+                                   {'keep': self.raw_retention_days}).scalar()
+            conn.execute(text("DELETE FROM shelf_fill_5m WHERE bucket < current_date - :keep"),
+                         {'keep': self.retention_5m_days})
+            return created, dropped
+        created, dropped = self.db_km.ANALITIC_IN_TRANSACTION(maintain, name='fill_history_maintain')
+        if created or dropped:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] История наполнения: создано секций {created}, "
+                  f"удалено {dropped}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_maintenance = loop.time() + self.maintenance_interval
+        while True:
+            await asyncio.sleep(self.rollup_interval)
+            try:
+                if not self.schema_ready:
+                    await self.worker.run(self.ensure_schema)
+                await self.worker.run(self.rollup)
+                if loop.time() >= next_maintenance:
+                    await self.worker.run(self.maintain)
+                    next_maintenance = loop.time() + self.maintenance_interval
+            except Exception as error:
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Ошибка обслуживания истории наполнения: {error}")
+
+    async def start(self):
+        try:
+            await self.worker.run(self.ensure_schema)
+        except Exception as error:
+            # Сервис принимает запросы, схема будет создана фоновой задачей
+            print(f"Схема истории наполнения не создана: {error}")
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- чтение ----------
+
+    def store_trend(self, id_store: int, start: str, end: str, resolution: str = '1h'):
+        """
+        Тренд наполнения магазина по агрегатам: среднее, минимум и максимум void по камерам магазина
+        и сумма минут ниже порога по камерам (камеро-минуты).
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution должен быть одним из {RESOLUTIONS}")
+        query = text(f"""
+            SELECT bucket, sum(void_sum)::float / sum(samples) AS void_avg, min(void_min) AS void_min,
+                   max(void_max) AS void_max, sum(minutes_below) AS minutes_below, sum(samples) AS samples
+            FROM shelf_fill_{resolution}
+            WHERE id_store = :id_store AND shelf = :shelf AND bucket >= :start AND bucket < :end
+            GROUP BY bucket
+            ORDER BY bucket
+        """)
+        return self.db_km.ANALITIC_TO_DATAFRAME(query, params={'id_store': id_store, 'shelf': CAMERA_SHELF,
+                                                               'start': start, 'end': end})
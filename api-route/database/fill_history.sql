@@ -0,0 +1,92 @@
+-- История наполнения полок (database/fill_history.py)
+--
+-- shelf_fill_raw      - сырые измерения: строка на полку (shelf >= 0) и строка на камеру целиком (shelf = -1),
+--                       секционирование по дням create_at, секции создает fill_history_create_partitions
+-- shelf_fill_5m/1h/1d - агрегаты по (магазин, камера, полка, интервал): количество измерений, сумма,
+--                       минимум и максимум void, минуты ниже порога наполнения
+-- shelf_fill_dirty    - 5-минутные интервалы с новыми сырыми строками, которые нужно пересчитать
+--
+-- Скрипт идемпотентен и выполняется при запуске сервиса.
+
+CREATE TABLE IF NOT EXISTS shelf_fill_raw (
+    id_store   integer   NOT NULL,
+    ip_camera  text      NOT NULL,
+    shelf      smallint  NOT NULL,
+    void       smallint  NOT NULL,
+    create_at  timestamp NOT NULL
+) PARTITION BY RANGE (create_at);
+
+-- Строки вне созданных секций (API отклоняет create_at вне диапазона секций, но часы
+-- сервиса и БД могут расходиться)
+CREATE TABLE IF NOT EXISTS shelf_fill_raw_default PARTITION OF shelf_fill_raw DEFAULT;
+
+CREATE INDEX IF NOT EXISTS shelf_fill_raw_store_idx ON shelf_fill_raw (id_store, create_at);
+
+CREATE TABLE IF NOT EXISTS shelf_fill_dirty (
+    bucket timestamp PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS shelf_fill_5m (
+    id_store      integer   NOT NULL,
+    ip_camera     text      NOT NULL,
+    shelf         smallint  NOT NULL,
+    bucket        timestamp NOT NULL,
+    samples       integer   NOT NULL,
+    void_sum      bigint    NOT NULL,
+    void_min      smallint  NOT NULL,
+    void_max      smallint  NOT NULL,
+    minutes_below real      NOT NULL,
+    PRIMARY KEY (id_store, bucket, ip_camera, shelf)
+);
+
+CREATE TABLE IF NOT EXISTS shelf_fill_1h (LIKE shelf_fill_5m INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS shelf_fill_1d (LIKE shelf_fill_5m INCLUDING ALL);
+
+-- Дневные секции от (сегодня - days_back) до (сегодня + days_ahead).
+-- Строки дня из секции по умолчанию переносятся в новую секцию: с ними
+-- CREATE TABLE ... PARTITION OF завершился бы ошибкой
+CREATE OR REPLACE FUNCTION fill_history_create_partitions(days_back integer, days_ahead integer)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    day date;
+    name text;
+    created integer := 0;
+BEGIN
+    FOR day IN SELECT generate_series(current_date - days_back, current_date + days_ahead, interval '1 day')::date LOOP
+        name := 'shelf_fill_raw_' || to_char(day, 'YYYYMMDD');
+        IF to_regclass(name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE shelf_fill_raw INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', name);
+            EXECUTE format('WITH moved AS (DELETE FROM shelf_fill_raw_default WHERE create_at >= %L AND create_at < %L '
+                           'RETURNING *) INSERT INTO %I SELECT * FROM moved', day, day + 1, name);
+            EXECUTE format('ALTER TABLE shelf_fill_raw ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           name, day, day + 1);
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Удаляет дневные секции старше keep_days: DROP TABLE вместо DELETE, без нагрузки на VACUUM
+CREATE OR REPLACE FUNCTION fill_history_drop_partitions(keep_days integer)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    part record;
+    dropped integer := 0;
+BEGIN
+    FOR part IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'shelf_fill_raw'
+          AND child.relname ~ '^shelf_fill_raw_[0-9]{8}$'
+          AND to_date(right(child.relname, 8), 'YYYYMMDD') < current_date - keep_days
+    LOOP
+        EXECUTE format('DROP TABLE %I', part.relname);
+        dropped := dropped + 1;
+    END LOOP;
+    DELETE FROM shelf_fill_raw_default WHERE create_at < current_date - keep_days;
+    RETURN dropped;
+END;
+$$;
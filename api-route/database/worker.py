@@ -1,4 +1,11 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
 from connect.BaseClass import BaseClass
+from database.fill_history import FillHistory
 import pandas as pd
 
 
@@ -6,11 +13,52 @@ import pandas as pd
 class DatabaseWorker(BaseClass):
     def __init__(self):
         super().__init__()
-    
+        if not hasattr(self, 'executor'):
+            # Синхронные вызовы SQLAlchemy выполняются в отдельном пуле потоков,
+            # чтобы не блокировать цикл событий aiohttp. Размер пула ограничивает
+            # количество одновременно занятых соединений с БД
+            self.executor = ThreadPoolExecutor(max_workers=int(os.getenv('DB_EXECUTOR_WORKERS', 8)),
+                                               thread_name_prefix='db')
+            self.max_pending = int(os.getenv('DB_MAX_PENDING', 1000))
+            self._pending = None
+            self.history = FillHistory(self)
+
+    async def run(self, func, *args):
+        """Выполняет синхронный метод БД в пуле потоков, не блокируя цикл событий"""
+        if self._pending is None:
+            # Ограничение очереди: при перегрузке БД запросы ждут здесь, а не копятся в пуле
+            self._pending = asyncio.Semaphore(self.max_pending)
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
 
     async def append_entrance(self, id_store:int, void:int, url:str = None, create_at:str = None):
         query = """
         INSERT INTO store_entrances (id_store, void, url, create_at)
-        VALUES (%s, %s, %s, %s)
+        VALUES (:id_store, :void, :url, :create_at)
+        """
+        await self.run(self.db_km.ANALITIC_QUERY, query,
+                       {'id_store': id_store, 'void': void, 'url': url, 'create_at': create_at})
+
+    def insert_entrances(self, rows: list):
+        """
+        Записывает строки store_entrances одним многострочным INSERT и измерения полок
+        в историю наполнения (shelf_fill_raw) в одной транзакции
         """
-        await self.db_km.ANALITIC_QUERY(query, (id_store, void, url, create_at))
+        columns = ('id_store', 'void', 'url', 'create_at')
+        values = ', '.join(
+            '(' + ', '.join(f":{column}_{index}" for column in columns) + ')' for index in range(len(rows))
+        )
+        params = {f"{column}_{index}": row[column] for index, row in enumerate(rows) for column in columns}
+        query = text(f"INSERT INTO store_entrances ({', '.join(columns)}) VALUES {values}")
+
+        def insert(conn):
+            conn.execute(query, params)
+            if self.history.schema_ready:
+                self.history.insert(conn, rows)
+        # Пока БД недоступна, пакет сразу получает CircuitOpenError и не занимает поток пула
+        self.db_km.ANALITIC_IN_TRANSACTION(insert, name='insert_entrances')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.db_km.close_connection_pool_analitik()
@@ -0,0 +1,12 @@
+import os
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from api.api import create_app
+
+load_dotenv()
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host=os.getenv('API_HOST', '0.0.0.0'), port=int(os.getenv('API_PORT', 8000)))